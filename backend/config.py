@@ -0,0 +1,145 @@
+import os
+from typing import List
+
+from cpu_layout import plan_cpu_layout
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment"""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting from the environment"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: List[str]) -> List[str]:
+    """Read a comma separated list setting from the environment"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# Uploads: files over this many bytes are refused with 413 (matches the frontend's limit)
+UPLOAD_MAX_BYTES = _env_int("UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+# Uploads up to this size are OCR'd from memory and written to disk in the background,
+# as long as all uploads held in memory stay within the budget
+UPLOAD_MEMORY_MAX_BYTES = _env_int("UPLOAD_MEMORY_MAX_BYTES", 4 * 1024 * 1024)
+UPLOAD_MEMORY_BUDGET = _env_int("UPLOAD_MEMORY_BUDGET", 64 * 1024 * 1024)
+
+# SQLite: one writer connection and this many readers, kept open while the API runs. Each
+# connection gets this much page cache and memory-mapped I/O, waits up to the busy timeout
+# for another process's lock, and keeps up to DB_STATEMENT_CACHE compiled statements
+DB_READERS = _env_int("DB_READERS", 4)
+DB_CACHE_MB = _env_int("DB_CACHE_MB", 16)
+DB_MMAP_MB = _env_int("DB_MMAP_MB", 256)
+DB_BUSY_TIMEOUT_MS = _env_int("DB_BUSY_TIMEOUT_MS", 5000)
+DB_STATEMENT_CACHE = _env_int("DB_STATEMENT_CACHE", 128)
+# Extraction records saved by concurrent requests are inserted together, in batches of up
+# to this many, waiting at most this long for a batch to fill. "commit" durability answers
+# once the record is committed; "enqueue" as soon as it is queued (faster, but a crash
+# loses the records of the last few milliseconds)
+DB_WRITE_BATCH_SIZE = _env_int("DB_WRITE_BATCH_SIZE", 64)
+DB_WRITE_BATCH_DELAY_MS = _env_float("DB_WRITE_BATCH_DELAY_MS", 2.0)
+DB_WRITE_DURABILITY = os.getenv("DB_WRITE_DURABILITY", "commit")
+
+# OCR engine
+OCR_LANGUAGES = _env_list("OCR_LANGUAGES", ["en"])
+OCR_USE_GPU = _env_bool("OCR_USE_GPU", False)  # Set to true if CUDA available
+
+# Quality tiers: the tier used when a request doesn't pick one, and an optional
+# JSON file overriding the built-in tiers' knobs (see quality.py)
+OCR_DEFAULT_QUALITY = os.getenv("OCR_DEFAULT_QUALITY", "balanced")
+OCR_QUALITY_TIERS_FILE = os.getenv("OCR_QUALITY_TIERS_FILE")
+
+# PDF rasterization: scanned pages of the balanced tier are scaled to roughly this
+# many pixels (2M is an A4 page at the former fixed 2x zoom), within the scale bounds
+OCR_PAGE_PIXEL_BUDGET = _env_int("OCR_PAGE_PIXEL_BUDGET", 2_000_000)
+OCR_MIN_RENDER_SCALE = _env_float("OCR_MIN_RENDER_SCALE", 1.0)
+OCR_MAX_RENDER_SCALE = _env_float("OCR_MAX_RENDER_SCALE", 4.0)
+
+# Image preprocessing profiles, chosen per image from a quality probe
+OCR_PROBE_SIZE = _env_int("OCR_PROBE_SIZE", 768)  # Side of the central crop that is measured
+OCR_NOISE_LIGHT = _env_float("OCR_NOISE_LIGHT", 2.0)  # Noise sigma below which denoising is skipped
+OCR_NOISE_HEAVY = _env_float("OCR_NOISE_HEAVY", 6.0)  # Noise sigma from which full denoising runs
+OCR_BLUR_SHARPNESS = _env_float("OCR_BLUR_SHARPNESS", 100.0)  # Laplacian variance of a blurry image
+OCR_LOW_CONTRAST = _env_float("OCR_LOW_CONTRAST", 30.0)  # Gray level std dev of a faint image
+
+# OCR worker pool: "process" runs each worker in a supervised child process, "thread"
+# shares the API process (needed for batching, but a crash in OCR takes the API down)
+OCR_POOL_MODE = os.getenv("OCR_POOL_MODE", "process")
+# Worker count and torch threads per worker are sized from the usable CPUs (affinity
+# and cgroup quota) unless set; 0 means automatic. OCR_PIN_CPUS pins process workers
+OCR_CPU_LAYOUT = plan_cpu_layout(
+    workers=_env_int("OCR_POOL_WORKERS", 0),
+    intra_op_threads=_env_int("OCR_TORCH_THREADS", 0),
+    inter_op_threads=_env_int("OCR_TORCH_INTEROP_THREADS", 0),
+    pin=_env_bool("OCR_PIN_CPUS", False),
+)
+OCR_POOL_WORKERS = OCR_CPU_LAYOUT.workers
+OCR_WARMUP = _env_bool("OCR_WARMUP", True)  # Load the readers in the background after startup
+OCR_PAGE_CONCURRENCY = _env_int("OCR_PAGE_CONCURRENCY", OCR_POOL_WORKERS)  # Pages of one PDF OCR'd at once
+# Preload (process mode, CPU only): load the model once and fork the workers from it,
+# sharing the weights copy-on-write
+OCR_PRELOAD = _env_bool("OCR_PRELOAD", False)
+# Worker supervision (process mode): a worker is replaced after this many OCR tasks (images
+# or PDF pages), or once its own memory passes the limit; 0 disables either. A task whose
+# worker dies is retried this many times in a fresh worker before it fails
+OCR_WORKER_MAX_TASKS = _env_int("OCR_WORKER_MAX_TASKS", 500)
+OCR_WORKER_MAX_MEMORY_MB = _env_int("OCR_WORKER_MAX_MEMORY_MB", 2048)
+OCR_WORKER_CRASH_RETRIES = _env_int("OCR_WORKER_CRASH_RETRIES", 1)
+# Autoscaling (process mode): the pool runs between OCR_POOL_MIN_WORKERS and OCR_POOL_WORKERS
+# workers, growing once queued OCR tasks would wait longer than the target for this many
+# seconds, and shrinking after this many seconds without needing its current size
+OCR_POOL_MIN_WORKERS = _env_int("OCR_POOL_MIN_WORKERS", 1)
+OCR_AUTOSCALE_TARGET_WAIT_SECONDS = _env_float("OCR_AUTOSCALE_TARGET_WAIT_SECONDS", 2.0)
+OCR_AUTOSCALE_UP_SECONDS = _env_float("OCR_AUTOSCALE_UP_SECONDS", 3.0)
+OCR_AUTOSCALE_DOWN_SECONDS = _env_float("OCR_AUTOSCALE_DOWN_SECONDS", 300.0)
+
+# Memory budget: documents reserve their estimated peak pixel count (rendered pages or
+# decoded images in flight) before OCR; work waits while the budget is used up. Smaller
+# documents may overtake a waiting large one until it has waited this many seconds
+OCR_PIXEL_BUDGET = _env_int("OCR_PIXEL_BUDGET", 16_000_000)
+OCR_BUDGET_MAX_BYPASS_SECONDS = _env_float("OCR_BUDGET_MAX_BYPASS_SECONDS", 30.0)
+
+# Cross-request recognition micro-batching (thread mode only): crops detected by
+# all workers are recognised together, up to a batch size or a wait in ms
+OCR_BATCHING = _env_bool("OCR_BATCHING", False)
+OCR_BATCH_MAX_SIZE = _env_int("OCR_BATCH_MAX_SIZE", 32)
+OCR_BATCH_MAX_WAIT_MS = _env_float("OCR_BATCH_MAX_WAIT_MS", 10.0)
+
+# Background extraction jobs
+JOB_WORKERS = _env_int("JOB_WORKERS", 4 * OCR_POOL_WORKERS)  # Concurrency is further bounded by OCR_PIXEL_BUDGET
+JOB_RESULT_TTL = _env_int("JOB_RESULT_TTL", 3600)  # Seconds a finished job stays queryable
+JOB_LEASE_SECONDS = _env_int("JOB_LEASE_SECONDS", 30)  # A job whose lease lapses is retried
+JOB_MAX_ATTEMPTS = _env_int("JOB_MAX_ATTEMPTS", 3)
+JOB_POLL_INTERVAL = _env_int("JOB_POLL_INTERVAL", 2)  # Seconds between queue polls when idle
+# Admission control: JOB_WORKERS bounds concurrent OCR; uploads arriving while this many
+# jobs are already queued are refused with 429 and a Retry-After from the drain rate
+JOB_MAX_QUEUE_DEPTH = _env_int("JOB_MAX_QUEUE_DEPTH", 50)  # Per priority lane
+
+# Scheduling: jobs run shortest first, estimating OCR time from their pixel cost, and
+# bulk jobs are treated as enqueued this many seconds later than interactive ones.
+# Requests sent with one of the bulk API keys (X-API-Key header) default to the bulk lane
+JOB_BULK_DELAY_SECONDS = _env_float("JOB_BULK_DELAY_SECONDS", 30.0)
+OCR_PIXELS_PER_SECOND = _env_float("OCR_PIXELS_PER_SECOND", 500_000.0)
+JOB_BULK_API_KEYS = _env_list("JOB_BULK_API_KEYS", [])
+
+# Credential verification (GET /verify): lookups by certificate or roll number are
+# served from an in-memory LRU hot set of this many entries in front of SQLite. Writes
+# made by this process invalidate entries at once; the TTL bounds staleness otherwise
+VERIFY_CACHE_ENTRIES = _env_int("VERIFY_CACHE_ENTRIES", 50_000)
+VERIFY_CACHE_TTL_SECONDS = _env_float("VERIFY_CACHE_TTL_SECONDS", 300.0)
+VERIFY_MAX_MATCHES = _env_int("VERIFY_MAX_MATCHES", 20)
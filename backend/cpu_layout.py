@@ -0,0 +1,113 @@
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# cgroup v2 quota file, and the cgroup v1 pair
+CGROUP_V2_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+CGROUP_V1_QUOTA = Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+CGROUP_V1_PERIOD = Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+# Intra-op threads given to each OCR worker when sizing automatically: enough for
+# torch to parallelise convolutions without workers fighting over the same cores
+THREADS_PER_WORKER = 2
+
+
+@dataclass
+class CPULayout:
+    """How the OCR workers are laid out on the host's CPUs"""
+    cpus: int  # CPUs usable by this process
+    affinity: List[int]  # CPU ids this process may run on
+    quota: Optional[float]  # cgroup CPU quota in CPUs, if any
+    workers: int
+    intra_op_threads: int
+    inter_op_threads: int
+    pin: bool
+    cpu_sets: List[List[int]] = field(default_factory=list)  # CPUs of each worker when pinned
+
+    def describe(self) -> str:
+        """One-line summary for the startup log"""
+        quota = f", cgroup quota {self.quota:g}" if self.quota is not None else ""
+        pinning = f", pinned to {self.cpu_sets}" if self.pin else ""
+        return (
+            f"{self.cpus} usable CPU(s){quota}: {self.workers} OCR worker(s) x "
+            f"{self.intra_op_threads} intra-op / {self.inter_op_threads} inter-op torch thread(s){pinning}"
+        )
+
+
+def cpu_affinity() -> List[int]:
+    """CPU ids the process is allowed to run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """CPU quota of the container's cgroup in CPUs (e.g. 1.5), or None when unlimited"""
+    try:
+        if CGROUP_V2_CPU_MAX.exists():
+            quota, period = CGROUP_V2_CPU_MAX.read_text().split()[:2]
+            if quota == "max":
+                return None
+            return int(quota) / int(period)
+        if CGROUP_V1_QUOTA.exists():
+            quota = int(CGROUP_V1_QUOTA.read_text())
+            if quota <= 0:
+                return None
+            return quota / int(CGROUP_V1_PERIOD.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read the cgroup CPU quota: {e}")
+    return None
+
+
+def plan_cpu_layout(
+    workers: int = 0, intra_op_threads: int = 0, inter_op_threads: int = 0, pin: bool = False
+) -> CPULayout:
+    """
+    Size the OCR pool for the CPUs actually available to this process: the
+    affinity mask, capped by the cgroup quota. Zero means automatic; any other
+    value is used as given.
+
+    Automatically, each worker gets THREADS_PER_WORKER intra-op threads and
+    there are as many workers as fit, so that workers x threads matches the
+    usable CPUs instead of every request's torch using all cores. Inter-op
+    parallelism is not useful for EasyOCR's sequential models and defaults to 1.
+    """
+    affinity = cpu_affinity()
+    quota = cgroup_cpu_quota()
+    cpus = len(affinity)
+    if quota is not None:
+        # Round down: threads beyond the quota only get throttled
+        cpus = min(cpus, max(1, math.floor(quota)))
+
+    if workers <= 0:
+        workers = max(1, cpus // min(THREADS_PER_WORKER, cpus))
+    if intra_op_threads <= 0:
+        intra_op_threads = max(1, cpus // workers)
+    if inter_op_threads <= 0:
+        inter_op_threads = 1
+
+    cpu_sets: List[List[int]] = []
+    if pin:
+        # Consecutive CPUs per worker, wrapping around when there are more workers than CPUs
+        usable = affinity[:cpus]
+        size = max(1, min(intra_op_threads, len(usable)))
+        cpu_sets = [
+            [usable[(n * size + i) % len(usable)] for i in range(size)]
+            for n in range(workers)
+        ]
+
+    return CPULayout(
+        cpus=cpus,
+        affinity=affinity,
+        quota=quota,
+        workers=workers,
+        intra_op_threads=intra_op_threads,
+        inter_op_threads=inter_op_threads,
+        pin=pin,
+        cpu_sets=cpu_sets,
+    )
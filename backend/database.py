@@ -1,21 +1,60 @@
 import sqlite3
 import json
+import time
+import asyncio
 import aiosqlite
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional
 from datetime import datetime
-from models import CredentialExtraction, ExtractionRecord
+import config
+from models import (
+    CREDENTIAL_COLUMNS, CREDENTIAL_INDEXES, CredentialExtraction, ExtractionJob, ExtractionRecord,
+    credential_column_expression,
+)
+from write_behind import WriteBehindBatcher
+
+EXTRACTION_COLUMNS = "file_id, original_filename, file_path, extracted_data_json, extraction_timestamp, content_hash"
 
 class Database:
-    """Database service for managing OCR extraction records"""
+    """Database service for managing OCR extraction records.
+    
+    ``initialize`` opens the connections once: a single writer, used by one
+    caller at a time, and a pool of read-only connections. The database is
+    in WAL mode, so readers see the last committed data without waiting for
+    the writer. Each connection keeps its own page cache and compiled
+    statements for the life of the process.
+    
+    Extraction records are inserted through a write-behind batcher, which
+    commits the records saved by concurrent requests together. In
+    ``enqueue`` durability mode a record not yet written is still returned
+    by ``get_extraction``.
+    
+    Extraction listeners are called with the extracted data of records once
+    they are committed or deleted, e.g. to invalidate caches of lookups.
+    """
     
-    def __init__(self, db_path: str = "../database/credentials.db"):
+    def __init__(self, db_path: str = "../database/credentials.db", readers: int = config.DB_READERS):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
+        self.readers = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._reader_pool: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._connections: List[aiosqlite.Connection] = []
+        self._inserts: WriteBehindBatcher[CredentialExtraction] = WriteBehindBatcher(self._insert_extractions)
+        # Records acknowledged but not yet committed (enqueue durability), by file_id
+        self._unsaved: Dict[str, CredentialExtraction] = {}
+        self._extraction_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
     
     async def initialize(self):
-        """Create database tables if they don't exist"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Open the connection pool and create database tables if they don't exist"""
+        if self._writer is not None:
+            return
+        self._writer = await self._connect()
+        # Persistent: the database file stays in WAL mode
+        await self._writer.execute("PRAGMA journal_mode = WAL")
+        async with self._write() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS extractions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -23,76 +62,388 @@ class Database:
                     original_filename TEXT NOT NULL,
                     file_path TEXT NOT NULL,
                     extracted_data_json TEXT NOT NULL,
-                    extraction_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    extraction_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    content_hash TEXT
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    original_filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    error TEXT,
+                    created_at DATETIME NOT NULL,
+                    updated_at DATETIME NOT NULL,
+                    content_hash TEXT,
+                    quality TEXT,
+                    priority TEXT NOT NULL DEFAULT 'interactive',
+                    cost INTEGER,
+                    enqueued_at REAL,
+                    cost_detail TEXT
+                )
+            """)
+            # Databases created before content hashing lack the column
+            await self._ensure_column(db, "extractions", "content_hash", "TEXT")
+            await self._ensure_column(db, "jobs", "content_hash", "TEXT")
+            await self._ensure_column(db, "jobs", "quality", "TEXT")
+            await self._ensure_column(db, "jobs", "priority", "TEXT NOT NULL DEFAULT 'interactive'")
+            await self._ensure_column(db, "jobs", "cost", "INTEGER")
+            await self._ensure_column(db, "jobs", "enqueued_at", "REAL")
+            await self._ensure_column(db, "jobs", "cost_detail", "TEXT")
+            # Credential fields as typed columns generated from the JSON; creating their
+            # indexes computes the values of the rows stored so far
+            for field, sql_type in CREDENTIAL_COLUMNS.items():
+                await self._ensure_column(
+                    db, "extractions", field,
+                    f"{sql_type} GENERATED ALWAYS AS ({credential_column_expression(field)}) VIRTUAL"
                 )
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_extractions_content_hash
+                ON extractions (content_hash)
+            """)
+            for index, columns in CREDENTIAL_INDEXES.items():
+                await db.execute(f"CREATE INDEX IF NOT EXISTS {index} ON extractions ({', '.join(columns)})")
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_lease
+                ON jobs (status, lease_expires_at)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_priority
+                ON jobs (status, priority)
             """)
-            await db.commit()
+        
+        # Opened after the schema is complete, so they never need to re-read it
+        for _ in range(self.readers):
+            self._reader_pool.put_nowait(await self._connect(read_only=True))
+        self._inserts.start()
+    
+    async def close(self):
+        """Write the queued records and close the pooled connections"""
+        await self._inserts.stop()
+        for db in self._connections:
+            await db.close()
+        self._connections.clear()
+        self._writer = None
+        self._reader_pool = asyncio.Queue()
+    
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Open a pooled connection with the tuned PRAGMAs"""
+        db = await aiosqlite.connect(self.db_path, cached_statements=config.DB_STATEMENT_CACHE)
+        db.row_factory = aiosqlite.Row
+        for pragma in (
+            # Safe with WAL: a power loss can only drop the last commits, never corrupt
+            "PRAGMA synchronous = NORMAL",
+            f"PRAGMA cache_size = -{config.DB_CACHE_MB * 1024}",
+            f"PRAGMA mmap_size = {config.DB_MMAP_MB * 2**20}",
+            f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}",
+            "PRAGMA temp_store = MEMORY",
+        ):
+            await db.execute(pragma)
+        if read_only:
+            await db.execute("PRAGMA query_only = ON")
+        self._connections.append(db)
+        return db
+    
+    @asynccontextmanager
+    async def _write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """The writer connection, one caller at a time; commits on success and rolls back on error"""
+        if self._writer is None:
+            raise RuntimeError("Database.initialize() must be called first")
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+    
+    @asynccontextmanager
+    async def _read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """A reader connection from the pool, waiting for one if all are in use"""
+        if self._writer is None:
+            raise RuntimeError("Database.initialize() must be called first")
+        db = await self._reader_pool.get()
+        try:
+            yield db
+        finally:
+            self._reader_pool.put_nowait(db)
+    
+    @staticmethod
+    async def _ensure_column(db: aiosqlite.Connection, table: str, column: str, definition: str):
+        """Add a column to an existing table if it is missing"""
+        # table_xinfo also lists generated columns
+        async with db.execute(f"PRAGMA table_xinfo({table})") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if column not in columns:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
     
     async def save_extraction(self, extraction: CredentialExtraction) -> bool:
-        """Save extraction record to database"""
+        """Save extraction record to database, batched with concurrent saves"""
+        if self._inserts.durability == "enqueue":
+            self._unsaved[extraction.file_id] = extraction
+        return await self._inserts.submit(extraction)
+    
+    async def _insert_extractions(self, extractions: List[CredentialExtraction]):
+        """Insert extraction records in one transaction"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
+            async with self._write() as db:
+                await db.executemany("""
                     INSERT INTO extractions 
-                    (file_id, original_filename, file_path, extracted_data_json, extraction_timestamp)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
+                    (file_id, original_filename, file_path, extracted_data_json, extraction_timestamp, content_hash)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [(
                     extraction.file_id,
                     extraction.original_filename,
                     extraction.file_path,
                     json.dumps(extraction.extracted_data, default=str),
-                    extraction.extraction_timestamp
-                ))
-                await db.commit()
-                return True
-        except Exception as e:
-            print(f"Error saving extraction: {e}")
-            return False
+                    extraction.extraction_timestamp,
+                    extraction.content_hash
+                ) for extraction in extractions])
+        finally:
+            for extraction in extractions:
+                self._unsaved.pop(extraction.file_id, None)
+        self._notify_extraction_listeners([extraction.extracted_data for extraction in extractions])
+    
+    def add_extraction_listener(self, listener: Callable[[List[Dict[str, Any]]], None]):
+        """Call listener with the extracted data of records that were committed or deleted"""
+        self._extraction_listeners.append(listener)
+    
+    def _notify_extraction_listeners(self, extracted_data: List[Dict[str, Any]]):
+        for listener in self._extraction_listeners:
+            try:
+                listener(extracted_data)
+            except Exception as e:
+                print(f"Error notifying extraction listener: {e}")
+    
+    def write_stats(self) -> Dict[str, Any]:
+        """Counters of the extraction write batcher"""
+        return self._inserts.status()
     
     async def get_extraction(self, file_id: str) -> Optional[Dict[str, Any]]:
         """Get extraction record by file_id"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
-                SELECT file_id, original_filename, file_path, extracted_data_json, extraction_timestamp
+        unsaved = self._unsaved.get(file_id)
+        if unsaved is not None:
+            return self._extraction_from_model(unsaved)
+        async with self._read() as db:
+            async with db.execute(f"""
+                SELECT {EXTRACTION_COLUMNS}
                 FROM extractions WHERE file_id = ?
             """, (file_id,)) as cursor:
                 row = await cursor.fetchone()
-                if row:
-                    return {
-                        "file_id": row[0],
-                        "original_filename": row[1],
-                        "file_path": row[2],
-                        "extracted_data": json.loads(row[3]),
-                        "extraction_timestamp": row[4]
-                    }
-                return None
+                return self._extraction_from_row(row) if row else None
+    
+    async def get_extraction_by_hash(
+        self, content_hash: str, quality: str, legacy_quality: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the earliest extraction record of a file with the given SHA-256 digest
+        that was extracted with the given quality tier. Records that predate
+        quality tiers count as legacy_quality.
+        """
+        async with self._read() as db:
+            async with db.execute(f"""
+                SELECT {EXTRACTION_COLUMNS}
+                FROM extractions
+                WHERE content_hash = ?
+                  AND COALESCE(json_extract(extracted_data_json, '$.processing.quality'), ?) = ?
+                ORDER BY id LIMIT 1
+            """, (content_hash, legacy_quality, quality)) as cursor:
+                row = await cursor.fetchone()
+                return self._extraction_from_row(row) if row else None
     
     async def get_all_extractions(self) -> List[Dict[str, Any]]:
         """Get all extraction records"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
-                SELECT file_id, original_filename, file_path, extracted_data_json, extraction_timestamp
+        async with self._read() as db:
+            async with db.execute(f"""
+                SELECT {EXTRACTION_COLUMNS}
                 FROM extractions ORDER BY extraction_timestamp DESC
             """) as cursor:
                 rows = await cursor.fetchall()
-                return [
-                    {
-                        "file_id": row[0],
-                        "original_filename": row[1],
-                        "file_path": row[2],
-                        "extracted_data": json.loads(row[3]),
-                        "extraction_timestamp": row[4]
-                    }
-                    for row in rows
-                ]
+                return [self._extraction_from_row(row) for row in rows]
+    
+    async def find_extractions(self, field: str, value: Any, limit: int) -> List[Dict[str, Any]]:
+        """Get the newest extraction records whose indexed credential field has the given value"""
+        if field not in CREDENTIAL_COLUMNS:
+            raise ValueError(f"Unknown credential field {field}. Available fields: {list(CREDENTIAL_COLUMNS)}")
+        async with self._read() as db:
+            async with db.execute(f"""
+                SELECT {EXTRACTION_COLUMNS}
+                FROM extractions WHERE {field} = ?
+                ORDER BY extraction_timestamp DESC LIMIT ?
+            """, (value, limit)) as cursor:
+                rows = await cursor.fetchall()
+                return [self._extraction_from_row(row) for row in rows]
+    
+    @staticmethod
+    def _extraction_from_row(row) -> Dict[str, Any]:
+        """Convert an extractions row selected with EXTRACTION_COLUMNS to a dict"""
+        return {
+            "file_id": row[0],
+            "original_filename": row[1],
+            "file_path": row[2],
+            "extracted_data": json.loads(row[3]),
+            "extraction_timestamp": row[4],
+            "content_hash": row[5]
+        }
+    
+    @staticmethod
+    def _extraction_from_model(extraction: CredentialExtraction) -> Dict[str, Any]:
+        """The dict _extraction_from_row would return once the record is stored"""
+        return {
+            "file_id": extraction.file_id,
+            "original_filename": extraction.original_filename,
+            "file_path": extraction.file_path,
+            "extracted_data": json.loads(json.dumps(extraction.extracted_data, default=str)),
+            "extraction_timestamp": str(extraction.extraction_timestamp),
+            "content_hash": extraction.content_hash
+        }
     
     async def delete_extraction(self, file_id: str) -> bool:
         """Delete extraction record"""
+        if file_id in self._unsaved:
+            # Don't let the queued insert bring it back
+            await self._inserts.flush()
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._write() as db:
+                async with db.execute(
+                    "SELECT extracted_data_json FROM extractions WHERE file_id = ?", (file_id,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
                 await db.execute("DELETE FROM extractions WHERE file_id = ?", (file_id,))
-                await db.commit()
-                return True
+            self._notify_extraction_listeners([json.loads(row[0]) for row in rows])
+            return True
         except Exception as e:
             print(f"Error deleting extraction: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    async def enqueue_job(self, job: ExtractionJob, max_attempts: int) -> bool:
+        """Persist a new job"""
+        try:
+            async with self._write() as db:
+                await db.execute("""
+                    INSERT INTO jobs
+                    (job_id, file_id, original_filename, file_path, status, attempts, max_attempts, created_at, updated_at,
+                     content_hash, quality, priority, cost, enqueued_at, cost_detail)
+                    VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    job.job_id,
+                    job.file_id,
+                    job.original_filename,
+                    job.file_path,
+                    job.status.value,
+                    max_attempts,
+                    job.created_at,
+                    job.updated_at,
+                    job.content_hash,
+                    job.quality,
+                    job.priority.value,
+                    job.cost.pixels if job.cost else None,
+                    time.time(),
+                    job.cost.json() if job.cost else None
+                ))
+            return True
+        except Exception as e:
+            print(f"Error enqueueing job: {e}")
+            return False
+    
+    async def claim_job(
+        self, worker_id: str, lease_seconds: float, bulk_delay: float, pixels_per_second: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next runnable job to a worker.
+        
+        Queued jobs and running jobs whose lease expired (their worker crashed
+        or the process restarted) are runnable. Expired jobs that already used
+        all their attempts are marked failed instead.
+        
+        Jobs run in order of enqueue time plus estimated OCR time (cost divided
+        by pixels_per_second), with bulk jobs pushed back by bulk_delay seconds.
+        Short and interactive jobs go first, and a long bulk job moves up as it
+        ages, so it is never starved.
+        """
+        now = time.time()
+        timestamp = datetime.now()
+        async with self._write() as db:
+            await db.execute("""
+                UPDATE jobs SET status = 'failed', error = 'Exceeded maximum attempts',
+                    lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+            """, (timestamp, now))
+            # A single UPDATE is atomic, so concurrent workers never claim the same job;
+            # RETURNING gives back that job, not another one the worker still holds
+            async with db.execute("""
+                UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                    lease_owner = ?, lease_expires_at = ?, updated_at = ?
+                WHERE job_id = (
+                    SELECT job_id FROM jobs
+                    WHERE (status = 'queued' OR (status = 'running' AND lease_expires_at < ?))
+                      AND attempts < max_attempts
+                    ORDER BY COALESCE(enqueued_at, 0) + COALESCE(cost, 0) / ?
+                        + CASE WHEN priority = 'bulk' THEN ? ELSE 0 END
+                    LIMIT 1
+                )
+                RETURNING *
+            """, (worker_id, now + lease_seconds, timestamp, now, float(pixels_per_second), bulk_delay)) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+    
+    async def heartbeat_job(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a job lease; returns False if the worker no longer holds it"""
+        async with self._write() as db:
+            cursor = await db.execute("""
+                UPDATE jobs SET lease_expires_at = ?
+                WHERE job_id = ? AND lease_owner = ? AND status = 'running'
+            """, (time.time() + lease_seconds, job_id, worker_id))
+            return cursor.rowcount > 0
+    
+    async def finish_job(self, job_id: str, worker_id: str, status: str, error: Optional[str] = None) -> bool:
+        """Record the outcome of a leased job and release the lease"""
+        async with self._write() as db:
+            cursor = await db.execute("""
+                UPDATE jobs SET status = ?, error = ?, lease_owner = NULL,
+                    lease_expires_at = NULL, updated_at = ?
+                WHERE job_id = ? AND lease_owner = ?
+            """, (status, error, datetime.now(), job_id, worker_id))
+            return cursor.rowcount > 0
+    
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get job record by job_id"""
+        async with self._read() as db:
+            async with db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+    
+    async def count_queued_jobs(self, priority: str) -> int:
+        """Number of jobs waiting in a priority lane"""
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND priority = ?", (priority,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0]
+    
+    async def count_jobs(self) -> Dict[str, Dict[str, int]]:
+        """Number of queued and running jobs, by priority lane (finished jobs are not counted)"""
+        counts: Dict[str, Dict[str, int]] = {}
+        async with self._read() as db:
+            async with db.execute("""
+                SELECT status, priority, COUNT(*) FROM jobs
+                WHERE status IN ('queued', 'running') GROUP BY status, priority
+            """) as cursor:
+                for status, priority, count in await cursor.fetchall():
+                    counts.setdefault(status, {})[priority] = count
+        return counts
+    
+    async def purge_jobs(self, finished_before: datetime) -> int:
+        """Delete finished jobs last updated before the given time"""
+        async with self._write() as db:
+            cursor = await db.execute("""
+                DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?
+            """, (finished_before,))
+            return cursor.rowcount
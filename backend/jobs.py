@@ -0,0 +1,380 @@
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+import config
+from database import Database
+from models import CredentialExtraction, DocumentCost, ExtractionJob, JobPriority, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobProcessor = Callable[[ExtractionJob], Awaitable[CredentialExtraction]]
+
+# Seconds of completed jobs the drain rate is measured over
+DRAIN_RATE_WINDOW = 60
+# Number of recent jobs per lane kept for the latency metrics
+LATENCY_SAMPLES = 200
+# Seconds between purges of finished jobs older than the result TTL
+PURGE_INTERVAL = 60
+
+
+def _percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50, p90 and p99 of a list of durations in seconds"""
+    ordered = sorted(samples)
+
+    def rank(percent: int) -> Optional[float]:
+        if not ordered:
+            return None
+        return round(ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)], 3)
+
+    return {"samples": len(ordered), "p50": rank(50), "p90": rank(90), "p99": rank(99)}
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its maximum depth"""
+
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Extraction queue is full ({depth} jobs waiting in this lane)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class JobManager:
+    """Runs extraction jobs in the background and tracks their state.
+
+    Jobs are persisted in the database ``jobs`` table. Workers lease a job,
+    heartbeat while processing it and release it when done; if the process
+    dies the lease expires and another worker retries the job, up to
+    ``max_attempts`` times. Callers can poll a job, wait for it to finish,
+    or subscribe to its state changes. Finished jobs are deleted once they
+    are ``result_ttl`` seconds old.
+
+    At most ``workers`` jobs run at once. Jobs are claimed shortest first
+    (by estimated pixel cost, with aging) and bulk jobs yield to interactive
+    ones for ``bulk_delay`` seconds. Submissions are refused with
+    ``QueueFullError`` while ``max_queue_depth`` jobs of the same lane are
+    already waiting, with a retry delay estimated from the rate at which
+    jobs complete, or made to wait for room in the lane.
+    """
+
+    def __init__(
+        self,
+        processor: JobProcessor,
+        database: Database,
+        workers: int = config.JOB_WORKERS,
+        result_ttl: int = config.JOB_RESULT_TTL,
+        lease_seconds: float = config.JOB_LEASE_SECONDS,
+        max_attempts: int = config.JOB_MAX_ATTEMPTS,
+        poll_interval: float = config.JOB_POLL_INTERVAL,
+        max_queue_depth: int = config.JOB_MAX_QUEUE_DEPTH,
+        bulk_delay: float = config.JOB_BULK_DELAY_SECONDS,
+        pixels_per_second: float = config.OCR_PIXELS_PER_SECOND,
+    ):
+        self.processor = processor
+        self.database = database
+        self.workers = max(1, workers)
+        self.result_ttl = result_ttl
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.max_queue_depth = max(1, max_queue_depth)
+        self.bulk_delay = bulk_delay
+        self.pixels_per_second = max(1.0, pixels_per_second)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._admission = asyncio.Lock()
+        # Replaced by a new event each time a worker of this process claims a job
+        self._claimed = asyncio.Event()
+        self._started_at = time.monotonic()
+        self._completed: deque = deque()  # monotonic completion times within DRAIN_RATE_WINDOW
+        # Per lane: seconds from submission to start, and to completion
+        self._waits = {lane: deque(maxlen=LATENCY_SAMPLES) for lane in JobPriority}
+        self._latencies = {lane: deque(maxlen=LATENCY_SAMPLES) for lane in JobPriority}
+        self._rejected = {lane: 0 for lane in JobPriority}
+        # Recent (pixels, seconds) of completed jobs, to compare with pixels_per_second
+        self._throughput: deque = deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self):
+        """Start the background workers"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._started_at = time.monotonic()
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self._owner}:{n}"), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._purge(), name="job-purge"))
+
+    async def stop(self):
+        """Cancel the background workers; their leases expire and the jobs are retried"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        file_id: str,
+        original_filename: str,
+        file_path: str,
+        content_hash: Optional[str] = None,
+        quality: Optional[str] = None,
+        status: JobStatus = JobStatus.QUEUED,
+        priority: JobPriority = JobPriority.INTERACTIVE,
+        cost: Optional[DocumentCost] = None,
+        wait: bool = False,
+    ) -> ExtractionJob:
+        """
+        Queue an uploaded file for extraction, or record an already finished one.
+        cost is the estimated OCR cost, handed on to the processor with the job.
+        Raises QueueFullError if the job's lane is at its maximum depth, or
+        with wait set, waits until the lane has room.
+        """
+        now = datetime.now()
+        job = ExtractionJob(
+            job_id=str(uuid.uuid4()),
+            status=status,
+            file_id=file_id,
+            original_filename=original_filename,
+            file_path=file_path,
+            content_hash=content_hash,
+            quality=quality,
+            priority=priority,
+            cost=cost,
+            created_at=now,
+            updated_at=now,
+        )
+        if job.finished:
+            await self._enqueue(job)
+            return job
+
+        while True:
+            # Serialize the depth check and the insert so concurrent uploads can't overshoot
+            async with self._admission:
+                depth = await self.database.count_queued_jobs(priority.value)
+                if depth < self.max_queue_depth:
+                    await self._enqueue(job)
+                    return job
+                if not wait:
+                    raise self._queue_full(priority, depth)
+            await self._wait_for_claim()
+
+    async def check_room(self, priority: JobPriority):
+        """Raise QueueFullError if a lane is at its maximum depth"""
+        depth = await self.database.count_queued_jobs(priority.value)
+        if depth >= self.max_queue_depth:
+            raise self._queue_full(priority, depth)
+
+    def _queue_full(self, priority: JobPriority, depth: int) -> QueueFullError:
+        """Count a rejection and build its error"""
+        self._rejected[priority] += 1
+        return QueueFullError(depth, self._retry_after(depth))
+
+    async def _wait_for_claim(self):
+        """Wait until a worker of this process claims a job, or a poll interval (other processes claim jobs too)"""
+        try:
+            await asyncio.wait_for(self._claimed.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _enqueue(self, job: ExtractionJob):
+        """Persist a new job and wake up a worker if it has to run"""
+        if not await self.database.enqueue_job(job, self.max_attempts):
+            raise RuntimeError("Could not queue extraction job")
+        if self._wakeup is not None and not job.finished:
+            self._wakeup.set()
+
+    def drain_rate(self) -> float:
+        """Jobs completed per second by this process's workers, over the last DRAIN_RATE_WINDOW seconds"""
+        now = time.monotonic()
+        while self._completed and self._completed[0] < now - DRAIN_RATE_WINDOW:
+            self._completed.popleft()
+        elapsed = min(DRAIN_RATE_WINDOW, now - self._started_at)
+        return len(self._completed) / elapsed if elapsed > 0 else 0.0
+
+    def _retry_after(self, depth: int) -> int:
+        """Seconds until the queue should have room again, at the current drain rate"""
+        rate = self.drain_rate()
+        if rate <= 0:
+            # Nothing finished recently: assume one job per worker per lease period
+            rate = self.workers / self.lease_seconds
+        excess = depth - self.max_queue_depth + 1
+        return max(1, math.ceil(excess / rate))
+
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth, drain rate, throughput and per-lane latency metrics"""
+        counts = await self.database.count_jobs()
+        pixels = sum(cost for cost, _ in self._throughput)
+        seconds = sum(duration for _, duration in self._throughput)
+        return {
+            "workers": self.workers,
+            "max_queue_depth": self.max_queue_depth,
+            "drain_rate_per_s": round(self.drain_rate(), 3),
+            # Measured counterpart of pixels_per_second, which orders the queue
+            "pixels_per_second": {
+                "configured": self.pixels_per_second,
+                "measured": round(pixels / seconds) if seconds > 0 else None,
+            },
+            "lanes": {
+                lane.value: {
+                    "queued": counts.get(JobStatus.QUEUED.value, {}).get(lane.value, 0),
+                    "running": counts.get(JobStatus.RUNNING.value, {}).get(lane.value, 0),
+                    "rejected": self._rejected[lane],
+                    "wait_seconds": _percentiles(list(self._waits[lane])),
+                    "latency_seconds": _percentiles(list(self._latencies[lane])),
+                }
+                for lane in JobPriority
+            },
+        }
+
+    async def get(self, job_id: str) -> Optional[ExtractionJob]:
+        """Get a job by id, with its extraction once it is done"""
+        row = await self.database.get_job(job_id)
+        if not row:
+            return None
+
+        result = None
+        if row["status"] == JobStatus.DONE.value:
+            extraction = await self.database.get_extraction(row["file_id"])
+            if extraction:
+                result = CredentialExtraction(**extraction)
+
+        return self._job_from_row(row, result=result, error=row["error"])
+
+    async def wait(self, job_id: str) -> ExtractionJob:
+        """Wait until a job is done or failed"""
+        async for job in self.subscribe(job_id):
+            if job.finished:
+                return job
+        raise KeyError(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[ExtractionJob]:
+        """Yield the job now and after every state change until it finishes"""
+        changed = asyncio.Event()
+        self._waiters.setdefault(job_id, set()).add(changed)
+        try:
+            last = None
+            while True:
+                changed.clear()
+                job = await self.get(job_id)
+                if job is None:
+                    return
+                if last is None or (job.status, job.attempts) != (last.status, last.attempts):
+                    yield job
+                    last = job
+                if job.finished:
+                    return
+                # Jobs may be processed by another process, so fall back to polling
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters[job_id].discard(changed)
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+
+    async def _purge(self):
+        """Delete expired finished jobs now and every PURGE_INTERVAL seconds"""
+        while True:
+            try:
+                await self.database.purge_jobs(datetime.now() - timedelta(seconds=self.result_ttl))
+            except Exception as e:
+                logger.error(f"Could not purge finished jobs: {e}")
+            await asyncio.sleep(PURGE_INTERVAL)
+
+    async def _worker(self, worker_id: str):
+        """Claim and process jobs one at a time"""
+        while True:
+            try:
+                row = await self.database.claim_job(
+                    worker_id, self.lease_seconds, self.bulk_delay, self.pixels_per_second
+                )
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} could not claim a job: {e}")
+                row = None
+
+            if row is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            claimed, self._claimed = self._claimed, asyncio.Event()
+            claimed.set()
+            try:
+                await self._run(worker_id, row)
+            except Exception as e:
+                # The lease will expire and the job is retried
+                logger.error(f"Job worker {worker_id} could not record job {row['job_id']}: {e}")
+
+    async def _run(self, worker_id: str, row: Dict[str, Any]):
+        """Run a single leased job and record its outcome"""
+        job = self._job_from_row(row)
+        self._notify(job.job_id)
+        self._waits[job.priority].append((datetime.now() - job.created_at).total_seconds())
+
+        started = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id, worker_id))
+        try:
+            await self.processor(job)
+        except Exception as e:
+            logger.error(f"Extraction job {job.job_id} failed: {e}")
+            await self.database.finish_job(job.job_id, worker_id, JobStatus.FAILED.value, str(e))
+        else:
+            await self.database.finish_job(job.job_id, worker_id, JobStatus.DONE.value)
+        finally:
+            heartbeat.cancel()
+            self._completed.append(time.monotonic())
+            self._latencies[job.priority].append((datetime.now() - job.created_at).total_seconds())
+            if job.cost and job.cost.pixels:
+                self._throughput.append((job.cost.pixels, time.monotonic() - started))
+            self._notify(job.job_id)
+
+    @staticmethod
+    def _job_from_row(row: Dict[str, Any], **fields: Any) -> ExtractionJob:
+        """Build a job from a jobs table row"""
+        return ExtractionJob(
+            job_id=row["job_id"],
+            status=JobStatus(row["status"]),
+            file_id=row["file_id"],
+            original_filename=row["original_filename"],
+            file_path=row["file_path"],
+            attempts=row["attempts"],
+            content_hash=row["content_hash"],
+            quality=row["quality"],
+            priority=JobPriority(row["priority"]),
+            # Jobs queued before costs were stored in full are estimated again when run
+            cost=DocumentCost.parse_raw(row["cost_detail"]) if row["cost_detail"] else None,
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            **fields,
+        )
+
+    async def _heartbeat(self, job_id: str, worker_id: str):
+        """Keep extending the lease of a running job"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self.database.heartbeat_job(job_id, worker_id, self.lease_seconds):
+                    logger.warning(f"Lost lease on job {job_id}")
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat for job {job_id} failed: {e}")
+
+    def _notify(self, job_id: str):
+        """Wake up callers waiting on a job"""
+        for changed in self._waiters.get(job_id, ()):
+            changed.set()
@@ -1,15 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Header, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 import os
+import json
+import asyncio
 import uuid
-import shutil
+import hashlib
+import logging
+import zipfile
+import aiofiles
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 
+import config
+from ocr_pool import OCRWorkerPool
+from ocr_supervisor import WorkerCrashedError
 from ocr_service import OCRService
 from database import Database
-from models import CredentialExtraction
+from jobs import JobManager, QueueFullError
+from models import CredentialExtraction, DocumentCost, ExtractionJob, JobPriority, JobStatus
+from quality import QUALITY_TIERS, get_tier
+from verification import CredentialVerifier
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Academic Credential OCR API",
@@ -17,6 +34,34 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Single-file upload endpoints whose declared body size can be checked up front
+SINGLE_UPLOAD_PATHS = {"/extract-text", "/jobs"}
+# Room for the multipart boundaries and headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadSizeLimit:
+    """
+    Refuse single-file uploads declared larger than the limit before their body is read.
+    Plain ASGI middleware: other requests, and streamed responses, pass straight through.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in SINGLE_UPLOAD_PATHS:
+            length = Headers(scope=scope).get("content-length", "")
+            if length.isdigit() and int(length) > config.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"File too large. Maximum size is {config.UPLOAD_MAX_BYTES} bytes"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(UploadSizeLimit)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,79 +72,622 @@ app.add_middleware(
 )
 
 # Initialize services
-ocr_service = OCRService()
+ocr_pool = OCRWorkerPool()
+ocr_service = OCRService(ocr_pool)
 database = Database()
+verifier = CredentialVerifier(database)
 
 # Ensure upload directory exists
 UPLOAD_DIR = Path("../uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+ALLOWED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
+
+# Leading bytes of each supported file type
+FILE_SIGNATURES = {
+    '.pdf': (b'%PDF-',),
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+    '.tiff': (b'II*\x00', b'MM\x00*'),
+    '.bmp': (b'BM',),
+}
+
+# Small uploads are OCR'd from memory, without reading back the copy written to disk
+upload_buffers: Dict[str, bytes] = {}
+pending_writes: Dict[str, asyncio.Task] = {}
+# Cost estimates of queued PDFs with the text layers read while estimating (jobs only store the cost)
+upload_costs: Dict[str, DocumentCost] = {}
+# Drop each upload's in-memory state once its job is finished, by whichever process ran it
+buffer_releases: Dict[str, asyncio.Task] = {}
 
 @app.on_event("startup")
 async def startup():
-    """Initialize database on startup"""
+    """Initialize database and start the job queue on startup; the OCR model warms up in the background"""
     await database.initialize()
+    await job_manager.start()
+    if config.OCR_WARMUP:
+        # Not awaited: the API serves requests (and text-layer PDFs) while the model loads
+        app.state.ocr_warmup = asyncio.get_running_loop().run_in_executor(None, ocr_pool.warm)
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the job queue and the OCR workers, and close the database"""
+    await job_manager.stop()
+    for task in buffer_releases.values():
+        task.cancel()
+    # Queued jobs are retried from disk after a restart, so finish writing their files
+    await asyncio.gather(*pending_writes.values(), *buffer_releases.values(), return_exceptions=True)
+    ocr_pool.shutdown()
+    await database.close()
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"message": "Academic Credential OCR API is running"}
 
-@app.post("/extract-text")
-async def extract_text(file: UploadFile = File(...)):
-    """
-    Extract credential information from uploaded PDF or image file
-    """
-    if not file.filename:
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once the OCR model is warm, 503 while the API is up but the model is not"""
+    ocr = ocr_pool.status()
+    return JSONResponse(
+        status_code=200 if ocr["state"] == "warm" else 503,
+        content={"api": "up", "ocr": ocr}
+    )
+
+# Content-hash deduplication counters
+cache_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+def _validate_filename(filename: Optional[str]) -> str:
+    """Check that a file name has a supported extension and return the extension"""
+    if not filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
     # Validate file type
-    allowed_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
-    file_extension = Path(file.filename).suffix.lower()
+    file_extension = Path(filename).suffix.lower()
     
-    if file_extension not in allowed_extensions:
+    if file_extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400, 
-            detail=f"File type {file_extension} not supported. Allowed types: {allowed_extensions}"
+            detail=f"File type {file_extension} not supported. Allowed types: {ALLOWED_EXTENSIONS}"
         )
+    return file_extension
+
+def _check_signature(head: bytes, file_extension: str):
+    """Check that the first bytes of a file match its extension"""
+    if not head:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    
+    if file_extension == '.pdf':
+        # Readers accept the PDF header anywhere in the first kilobyte
+        matches = FILE_SIGNATURES['.pdf'][0] in head[:1024]
+    else:
+        matches = head.startswith(FILE_SIGNATURES[file_extension])
+    if not matches:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File content does not match its {file_extension} extension"
+        )
+
+async def _store_stream(
+    read: Callable[[int], Awaitable[bytes]], file_extension: str
+) -> Tuple[str, Path, str]:
+    """
+    Receive a stream chunk by chunk and return its id, upload path and SHA-256.
+    The content is sniffed from the first chunk and refused as soon as it goes
+    over the upload size limit. Small files are kept in memory for OCR and
+    written to the upload path while they are queued (see _submit_upload);
+    larger ones are written as they arrive.
+    """
+    chunk = await read(UPLOAD_CHUNK_SIZE)
+    _check_signature(chunk, file_extension)
+    
+    # Generate unique filename
+    file_id = str(uuid.uuid4())
+    file_path = UPLOAD_DIR / f"{file_id}{file_extension}"
+    
+    digest = hashlib.sha256()
+    size = 0
+    chunks: List[bytes] = []
+    buffer = None
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > config.UPLOAD_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large. Maximum size is {config.UPLOAD_MAX_BYTES} bytes"
+                )
+            digest.update(chunk)
+            
+            if buffer is None and size > config.UPLOAD_MEMORY_MAX_BYTES:
+                # Too large to keep in memory: save uploaded file as it arrives
+                buffer = await aiofiles.open(file_path, "wb")
+                for buffered in chunks:
+                    await buffer.write(buffered)
+                chunks = []
+            if buffer is None:
+                chunks.append(chunk)
+            else:
+                await buffer.write(chunk)
+            chunk = await read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        if buffer is not None:
+            await buffer.close()
+            file_path.unlink(missing_ok=True)
+        raise
+    
+    if buffer is not None:
+        await buffer.close()
+    else:
+        data = b"".join(chunks)
+        if sum(map(len, upload_buffers.values())) + len(data) <= config.UPLOAD_MEMORY_BUDGET:
+            upload_buffers[file_id] = data
+        else:
+            async with aiofiles.open(file_path, "wb") as buffer:
+                await buffer.write(data)
+    
+    return file_id, file_path, digest.hexdigest()
+
+async def _write_upload(file_id: str, file_path: Path, data: bytes):
+    """Write an upload kept in memory to its upload path"""
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            await buffer.write(data)
+    except Exception as e:
+        logger.error(f"Could not write upload {file_id}: {e}")
+    finally:
+        pending_writes.pop(file_id, None)
+
+async def _release_buffer(job_id: str, file_id: str):
+    """Drop an upload's in-memory state once its job is finished, even if another process ran it"""
+    try:
+        await job_manager.wait(job_id)
+    except Exception as e:
+        logger.warning(f"Stopped waiting for job {job_id}: {e}")
+    finally:
+        upload_buffers.pop(file_id, None)
+        upload_costs.pop(file_id, None)
+        buffer_releases.pop(file_id, None)
+
+def _queue_full(e: QueueFullError) -> HTTPException:
+    """429 answer, with a Retry-After header, for a full priority lane"""
+    return HTTPException(
+        status_code=429,
+        detail=f"Server busy: {e}. Retry after {e.retry_after} seconds",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def _check_room(lane: JobPriority):
+    """
+    Answer 429 early if a lane is full, before an upload is stored and estimated.
+    Admission itself happens when the job is queued.
+    """
+    try:
+        await job_manager.check_room(lane)
+    except QueueFullError as e:
+        raise _queue_full(e)
+
+async def _submit_upload(
+    file_id: str, original_filename: str, file_path: Path, content_hash: str, quality: str, priority: JobPriority,
+    wait: bool = False
+) -> ExtractionJob:
+    """
+    Queue an upload for extraction in its priority lane, ordered by its estimated OCR cost.
+    An upload in memory is written to disk while its cost is estimated, and queued once
+    written, since another process may claim the job.
+    Answers 429 with a Retry-After header when the lane is full, unless wait is set,
+    in which case it waits for room in the lane.
+    """
+    data = upload_buffers.get(file_id)
+    if data is not None:
+        pending_writes[file_id] = asyncio.create_task(_write_upload(file_id, file_path, data))
+    try:
+        cost = await ocr_service.estimate_cost(data if data is not None else file_path, file_path.suffix, quality)
+        if file_id in pending_writes:
+            await asyncio.shield(pending_writes[file_id])
+        job = await job_manager.submit(
+            file_id, original_filename, str(file_path), content_hash, quality,
+            priority=priority, cost=cost, wait=wait
+        )
+    except BaseException as e:
+        # Nothing will process the upload, so drop it
+        upload_buffers.pop(file_id, None)
+        if file_id in pending_writes:
+            await asyncio.shield(pending_writes[file_id])
+        file_path.unlink(missing_ok=True)
+        if isinstance(e, QueueFullError):
+            raise _queue_full(e)
+        if isinstance(e, WorkerCrashedError):
+            raise HTTPException(status_code=400, detail=f"Could not read the file: {e}")
+        raise
+    if cost.text_layers is not None:
+        upload_costs[file_id] = cost
+    if file_id in upload_buffers or file_id in upload_costs:
+        buffer_releases[file_id] = asyncio.create_task(_release_buffer(job.job_id, file_id))
+    return job
+
+async def _save_upload(file: UploadFile) -> Tuple[str, Path, str]:
+    """Validate an uploaded file, store it in the upload directory and return its SHA-256"""
+    file_extension = _validate_filename(file.filename)
+    return await _store_stream(file.read, file_extension)
+
+def _resolve_priority(priority: Optional[str], api_key: Optional[str], default: JobPriority) -> JobPriority:
+    """Pick the scheduling lane: the requested one, else bulk for bulk API keys, else the endpoint's default"""
+    if priority:
+        try:
+            return JobPriority(priority)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown priority {priority}. Available priorities: {[lane.value for lane in JobPriority]}"
+            )
+    if api_key and api_key in config.JOB_BULK_API_KEYS:
+        return JobPriority.BULK
+    return default
+
+def _resolve_quality(quality: Optional[str]) -> str:
+    """Validate the requested quality tier, defaulting to the configured one"""
+    try:
+        return get_tier(quality).name
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _reuse_cached_extraction(
+    file_id: str, original_filename: str, file_path: Path, content_hash: str, quality: str, no_cache: bool
+) -> Optional[CredentialExtraction]:
+    """
+    Record an upload whose content was already extracted with the same quality tier,
+    reusing the stored data. Returns None when the upload has to go through OCR.
+    """
+    if no_cache:
+        cache_stats["bypassed"] += 1
+        return None
+    
+    cached = await database.get_extraction_by_hash(content_hash, quality, config.OCR_DEFAULT_QUALITY)
+    if not cached:
+        cache_stats["misses"] += 1
+        return None
+    
+    cache_stats["hits"] += 1
+    extraction = CredentialExtraction(
+        file_id=file_id,
+        original_filename=original_filename,
+        file_path=cached["file_path"],
+        extracted_data=cached["extracted_data"],
+        extraction_timestamp=datetime.now(),
+        content_hash=content_hash
+    )
+    if not await database.save_extraction(extraction):
+        # Go through OCR instead, which reports the failure if the database stays unavailable
+        return None
+    
+    # The original upload is kept, so drop the duplicate copy
+    upload_buffers.pop(file_id, None)
+    file_path.unlink(missing_ok=True)
+    return extraction
+
+async def process_job(job: ExtractionJob) -> CredentialExtraction:
+    """Run OCR on a queued upload and store the extraction record"""
+    file_path = Path(job.file_path)
+    # Uploads received by this process may still be in memory, and PDFs' text layers too
+    data = upload_buffers.pop(job.file_id, None)
+    cost = upload_costs.pop(job.file_id, None) or job.cost
+    
+    # A retried job may have been stored before its worker died
+    existing = await database.get_extraction(job.file_id)
+    if existing:
+        return CredentialExtraction(**existing)
     
     try:
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        file_path = UPLOAD_DIR / f"{file_id}{file_extension}"
-        
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
         # Extract text using OCR
-        extracted_data = await ocr_service.extract_credentials(file_path)
+        if data is not None:
+            extracted_data = await ocr_service.extract_credentials_from_bytes(data, file_path.suffix, job.quality, cost)
+        else:
+            extracted_data = await ocr_service.extract_credentials(file_path, job.quality, cost)
         
         # Create extraction record
         extraction = CredentialExtraction(
-            file_id=file_id,
-            original_filename=file.filename,
+            file_id=job.file_id,
+            original_filename=job.original_filename,
             file_path=str(file_path),
             extracted_data=extracted_data,
-            extraction_timestamp=datetime.now()
+            extraction_timestamp=datetime.now(),
+            content_hash=job.content_hash
         )
         
-        # Save to database
-        await database.save_extraction(extraction)
-        
-        return JSONResponse(content={
-            "status": "success",
-            "file_id": file_id,
-            "original_filename": file.filename,
-            "extracted_data": extracted_data,
-            "timestamp": extraction.extraction_timestamp.isoformat()
-        })
+        # Save to database; the job result is read back from it
+        if not await database.save_extraction(extraction):
+            raise RuntimeError("Could not save the extraction record")
+        return extraction
     
-    except Exception as e:
-        # Clean up file if extraction failed
-        if 'file_path' in locals() and file_path.exists():
+    except Exception:
+        # Clean up file if extraction failed, once it is fully written
+        if job.file_id in pending_writes:
+            await asyncio.shield(pending_writes[job.file_id])
+        if file_path.exists():
             file_path.unlink()
+        raise
+
+job_manager = JobManager(process_job, database)
+
+def _job_response(job: ExtractionJob) -> Dict[str, Any]:
+    """Serialize a job for API responses"""
+    return jsonable_encoder(job)
+
+@app.post("/extract-text")
+async def extract_text(
+    file: UploadFile = File(...),
+    quality: Optional[str] = None,
+    no_cache: bool = False,
+    priority: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None)
+):
+    """
+    Extract credential information from uploaded PDF or image file.
+    quality picks the OCR tier (e.g. fast, balanced, accurate).
+    Set no_cache to run OCR even if the same file was extracted before.
+    priority picks the scheduling lane, interactive by default.
+    """
+    quality = _resolve_quality(quality)
+    lane = _resolve_priority(priority, x_api_key, JobPriority.INTERACTIVE)
+    await _check_room(lane)
+    file_id, file_path, content_hash = await _save_upload(file)
+    
+    extraction = await _reuse_cached_extraction(file_id, file.filename, file_path, content_hash, quality, no_cache)
+    cached = extraction is not None
+    if not cached:
+        # Run through the job queue and wait for the result
+        job = await _submit_upload(file_id, file.filename, file_path, content_hash, quality, lane)
+        job = await job_manager.wait(job.job_id)
         
-        raise HTTPException(status_code=500, detail=f"OCR extraction failed: {str(e)}")
+        if job.status == JobStatus.FAILED:
+            raise HTTPException(status_code=500, detail=f"OCR extraction failed: {job.error}")
+        if job.result is None:
+            raise HTTPException(status_code=500, detail="Extraction record not found")
+        extraction = job.result
+    
+    return JSONResponse(content=_extraction_response(extraction, cached))
+
+def _extraction_response(extraction: CredentialExtraction, cached: bool) -> Dict[str, Any]:
+    """Response body for a successful extraction"""
+    return {
+        "status": "success",
+        "file_id": extraction.file_id,
+        "original_filename": extraction.original_filename,
+        "extracted_data": jsonable_encoder(extraction.extracted_data),
+        "timestamp": extraction.extraction_timestamp.isoformat(),
+        "cached": cached
+    }
+
+def _iter_zip_members(archive: BinaryIO) -> Iterator[Tuple[str, Optional[BinaryIO], Optional[str]]]:
+    """
+    Yield (filename, stream, error) for each document in a ZIP archive.
+    Members are decompressed lazily while they are read, never all at once.
+    A member that can't be opened yields an error and the others still follow.
+    """
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile as e:
+        yield "", None, f"Invalid ZIP archive: {e}"
+        return
+    
+    with zip_file:
+        for member in zip_file.infolist():
+            name = Path(member.filename).name
+            # Skip folders and OS metadata such as __MACOSX/ and .DS_Store
+            if member.is_dir() or not name or name.startswith(".") or member.filename.startswith("__MACOSX/"):
+                continue
+            try:
+                stream = zip_file.open(member)
+            except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                # Encrypted member, unsupported compression or a corrupt entry
+                yield name, None, f"Could not read {member.filename} from the archive: {e}"
+                continue
+            with stream:
+                yield name, stream, None
+
+async def _ingest_batch_document(
+    filename: str, stream: BinaryIO, quality: str, no_cache: bool, lane: JobPriority
+) -> Tuple[Optional[CredentialExtraction], Optional[str]]:
+    """
+    Store one document of a batch and either reuse a cached extraction or queue a job,
+    waiting for room in the lane when it is full.
+    Returns the cached extraction or the id of the queued job.
+    """
+    file_extension = _validate_filename(filename)
+    loop = asyncio.get_running_loop()
+    
+    async def read(size: int) -> bytes:
+        # ZIP members are decompressed while read, so keep that off the event loop
+        return await loop.run_in_executor(None, stream.read, size)
+    
+    file_id, file_path, content_hash = await _store_stream(read, file_extension)
+    
+    extraction = await _reuse_cached_extraction(file_id, filename, file_path, content_hash, quality, no_cache)
+    if extraction:
+        return extraction, None
+    job = await _submit_upload(file_id, filename, file_path, content_hash, quality, lane, wait=True)
+    return None, job.job_id
+
+@app.post("/extract-batch")
+async def extract_batch(
+    files: List[UploadFile] = File(...),
+    quality: Optional[str] = None,
+    no_cache: bool = False,
+    priority: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None)
+):
+    """
+    Extract credential information from many PDF or image files, or ZIP archives of them.
+    Documents are queued while the response streams, waiting for room in their lane
+    when it is full, and one NDJSON line is streamed per document as soon as it
+    completes, followed by a summary line. A failing document does not abort the
+    batch. Batches run in the bulk lane unless priority says otherwise; a batch
+    arriving while its lane is full is refused as a whole with 429.
+    """
+    quality = _resolve_quality(quality)
+    lane = _resolve_priority(priority, x_api_key, JobPriority.BULK)
+    await _check_room(lane)
+    
+    # Results of documents, in completion order; None once every document is ingested
+    results: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+    waiters: List[asyncio.Task] = []
+    index = 0
+    
+    async def wait_for(item: Dict[str, Any], job_id: str):
+        try:
+            job = await job_manager.wait(job_id)
+        except Exception as e:
+            results.put_nowait({**item, "status": "error", "detail": f"Lost track of the extraction job: {e}"})
+            return
+        if job.status == JobStatus.FAILED:
+            results.put_nowait({**item, "status": "error", "detail": f"OCR extraction failed: {job.error}"})
+        elif job.result is None:
+            results.put_nowait({**item, "status": "error", "detail": "Extraction record not found"})
+        else:
+            results.put_nowait({**item, **_extraction_response(job.result, False)})
+    
+    async def ingest(filename: str, stream: Optional[BinaryIO], error: Optional[str]):
+        nonlocal index
+        item = {"index": index, "filename": filename}
+        index += 1
+        if error:
+            results.put_nowait({**item, "status": "error", "detail": error})
+            return
+        try:
+            extraction, job_id = await _ingest_batch_document(filename, stream, quality, no_cache, lane)
+        except HTTPException as e:
+            results.put_nowait({**item, "status": "error", "detail": e.detail})
+        except Exception as e:
+            results.put_nowait({**item, "status": "error", "detail": f"Could not store file: {e}"})
+        else:
+            if extraction:
+                results.put_nowait({**item, **_extraction_response(extraction, True)})
+            else:
+                waiters.append(asyncio.create_task(wait_for(item, job_id)))
+    
+    async def ingest_all():
+        try:
+            for file in files:
+                if file.filename and Path(file.filename).suffix.lower() == ".zip":
+                    # Starlette spools uploads to a temporary file, so the archive is read from disk
+                    for filename, stream, error in _iter_zip_members(file.file):
+                        await ingest(filename or file.filename, stream, error)
+                else:
+                    await ingest(file.filename or "", file.file, None)
+        except Exception as e:
+            logger.error(f"Batch ingestion stopped: {e}")
+        finally:
+            results.put_nowait(None)
+    
+    async def lines():
+        # The uploaded files stay open until the response is sent, so they are read from here
+        ingestion = asyncio.create_task(ingest_all())
+        reported = succeeded = 0
+        ingested = False
+        try:
+            while not ingested or reported < index:
+                result = await results.get()
+                if result is None:
+                    ingested = True
+                    continue
+                reported += 1
+                succeeded += result["status"] == "success"
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"status": "complete", "total": index, "succeeded": succeeded, "failed": index - succeeded}) + "\n"
+        finally:
+            # The client went away: stop queueing, the jobs already queued still run
+            ingestion.cancel()
+            for waiter in waiters:
+                waiter.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    quality: Optional[str] = None,
+    no_cache: bool = False,
+    priority: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None)
+):
+    """
+    Queue an uploaded PDF or image file for extraction and return immediately.
+    Uploads already extracted before are recorded as done jobs unless no_cache is set.
+    priority picks the scheduling lane, interactive by default.
+    """
+    quality = _resolve_quality(quality)
+    lane = _resolve_priority(priority, x_api_key, JobPriority.INTERACTIVE)
+    await _check_room(lane)
+    file_id, file_path, content_hash = await _save_upload(file)
+    
+    extraction = await _reuse_cached_extraction(file_id, file.filename, file_path, content_hash, quality, no_cache)
+    if extraction:
+        job = await job_manager.submit(
+            file_id, file.filename, extraction.file_path, content_hash, quality, status=JobStatus.DONE, priority=lane
+        )
+    else:
+        job = await _submit_upload(file_id, file.filename, file_path, content_hash, quality, lane)
+    return JSONResponse(
+        status_code=202,
+        content=_job_response(job),
+        headers={"Location": f"/jobs/{job.job_id}"}
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of an extraction job"""
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Stream job state changes as server-sent events"""
+    if not await job_manager.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for job in job_manager.subscribe(job_id):
+            yield f"event: {job.status.value}\ndata: {json.dumps(_job_response(job))}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/quality-tiers")
+async def get_quality_tiers():
+    """List the OCR quality tiers and their pipeline settings"""
+    return {"default": config.OCR_DEFAULT_QUALITY, "tiers": list(QUALITY_TIERS.values())}
+
+@app.get("/metrics")
+async def metrics():
+    """Operational counters"""
+    return {
+        "dedup_cache": cache_stats,
+        "job_queue": await job_manager.stats(),
+        "pixel_budget": ocr_service.budget.status(),
+        "recognition_batching": ocr_pool.batching_stats(),
+        "ocr_workers": ocr_pool.supervision_stats(),
+        "extraction_writes": database.write_stats(),
+        "verification": verifier.status()
+    }
+
+@app.get("/verify")
+async def verify_credential(
+    certificate_number: Optional[str] = None,
+    roll_number: Optional[str] = None,
+    name: Optional[str] = None
+):
+    """Find the records with a certificate or roll number and grade them against the given details"""
+    try:
+        return await verifier.verify(certificate_number, roll_number, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/extractions")
 async def get_extractions():
@@ -1,16 +1,51 @@
 from pydantic import BaseModel, Field
-from sqlalchemy import Column, Integer, String, DateTime, Text, create_engine
+from sqlalchemy import Column, Computed, Float, Index, Integer, String, DateTime, Text, create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
-from typing import Dict, Any, Optional
+from enum import Enum
+from typing import Dict, Any, List, Literal, Optional
 import json
 
 Base = declarative_base()
 
+# Credential fields stored as typed columns of the extractions table, by SQL type. They are
+# virtual columns generated from extracted_data_json: computed when read, and kept in the
+# indexes below, so lookups by field don't parse the JSON of every row
+CREDENTIAL_COLUMNS = {
+    "name": "TEXT",
+    "roll_number": "TEXT",
+    "degree": "TEXT",
+    "issue_year": "INTEGER",
+    "institution": "TEXT",
+    "grade": "TEXT",
+    "specialization": "TEXT",
+    "certificate_number": "TEXT",
+    "confidence_score": "REAL",
+}
+
+# Indexes of the extractions table over the credential columns, by name
+CREDENTIAL_INDEXES = {
+    "idx_extractions_certificate_number": ("certificate_number",),
+    "idx_extractions_roll_number": ("roll_number",),
+    "idx_extractions_institution_year": ("institution", "issue_year"),
+    "idx_extractions_timestamp": ("extraction_timestamp",),
+}
+
+def credential_column_expression(field: str) -> str:
+    """SQL expression generating a credential column from extracted_data_json"""
+    expression = f"json_extract(extracted_data_json, '$.{field}')"
+    sql_type = CREDENTIAL_COLUMNS[field]
+    return expression if sql_type == "TEXT" else f"CAST({expression} AS {sql_type})"
+
+def _credential_column(field: str, column_type) -> Column:
+    """Generated (virtual) column of a credential field"""
+    return Column(column_type, Computed(credential_column_expression(field), persisted=False))
+
 class ExtractionRecord(Base):
     """SQLAlchemy model for storing OCR extraction records"""
     __tablename__ = "extractions"
+    __table_args__ = tuple(Index(name, *columns) for name, columns in CREDENTIAL_INDEXES.items())
     
     id = Column(Integer, primary_key=True, index=True)
     file_id = Column(String, unique=True, index=True)
@@ -18,6 +53,18 @@ class ExtractionRecord(Base):
     file_path = Column(String)
     extracted_data_json = Column(Text)  # Store JSON as text
     extraction_timestamp = Column(DateTime, default=datetime.now)
+    content_hash = Column(String, index=True)  # SHA-256 of the uploaded file
+    
+    # Credential fields, read-only: they follow extracted_data
+    name = _credential_column("name", Text)
+    roll_number = _credential_column("roll_number", Text)
+    degree = _credential_column("degree", Text)
+    issue_year = _credential_column("issue_year", Integer)
+    institution = _credential_column("institution", Text)
+    grade = _credential_column("grade", Text)
+    specialization = _credential_column("specialization", Text)
+    certificate_number = _credential_column("certificate_number", Text)
+    confidence_score = _credential_column("confidence_score", Float)
     
     @property
     def extracted_data(self) -> Dict[str, Any]:
@@ -38,6 +85,7 @@ class CredentialExtraction(BaseModel):
     file_path: str
     extracted_data: Dict[str, Any]
     extraction_timestamp: datetime
+    content_hash: Optional[str] = None
 
 class ExtractedCredential(BaseModel):
     """Pydantic model for the extracted credential fields"""
@@ -51,6 +99,7 @@ class ExtractedCredential(BaseModel):
     certificate_number: Optional[str] = Field(None, description="Certificate or diploma number")
     raw_text: Optional[str] = Field(None, description="Complete extracted text")
     confidence_score: Optional[float] = Field(None, description="OCR confidence score")
+    processing: Optional[Dict[str, Any]] = Field(None, description="OCR pipeline metadata, e.g. per-page render scale")
 
 class OCRResponse(BaseModel):
     """Pydantic model for API response"""
@@ -58,4 +107,60 @@ class OCRResponse(BaseModel):
     file_id: str
     original_filename: str
     extracted_data: ExtractedCredential
-    timestamp: str
\ No newline at end of file
+    timestamp: str
+
+class QualityTier(BaseModel):
+    """Pydantic model for an OCR pipeline configuration selected by the quality parameter"""
+    name: str
+    page_pixel_budget: int = Field(..., description="Target pixel count of a rendered scanned PDF page")
+    preprocessing: Literal["auto", "clean", "light", "denoise"] = Field(
+        "auto", description="Preprocessing profile, or auto to choose it from an image quality probe"
+    )
+    decoder: Literal["greedy", "beamsearch"] = Field("greedy", description="EasyOCR recognition decoder")
+    beam_width: int = Field(5, description="Beam width when decoder is beamsearch")
+    batch_size: int = Field(1, description="EasyOCR recognition batch size")
+    max_image_side: int = Field(2560, description="Images are downscaled to at most this many pixels per side")
+
+class DocumentCost(BaseModel):
+    """Pydantic model for the estimated OCR cost of a document, computed before running it"""
+    pages: int = Field(1, description="Number of pages, 1 for images")
+    ocr_pages: int = Field(0, description="Pages without a text layer, which need OCR")
+    pixels: int = Field(0, description="Total pixels to OCR")
+    peak_pixels: int = Field(0, description="Pixels held in memory at once while processing")
+    text_layers: Optional[List[str]] = Field(
+        None, exclude=True, description="Text layer of every PDF page, read while estimating; never serialized"
+    )
+
+class JobStatus(str, Enum):
+    """Lifecycle states of an asynchronous extraction job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class JobPriority(str, Enum):
+    """Scheduling lanes of extraction jobs"""
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+class ExtractionJob(BaseModel):
+    """Pydantic model for an asynchronous extraction job"""
+    job_id: str
+    status: JobStatus = JobStatus.QUEUED
+    file_id: str
+    original_filename: str
+    file_path: str
+    attempts: int = 0
+    content_hash: Optional[str] = None
+    quality: Optional[str] = None
+    priority: JobPriority = JobPriority.INTERACTIVE
+    cost: Optional[DocumentCost] = Field(None, description="Estimated OCR cost, used to run short jobs first")
+    created_at: datetime
+    updated_at: datetime
+    result: Optional[CredentialExtraction] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job reached a terminal state"""
+        return self.status in (JobStatus.DONE, JobStatus.FAILED)
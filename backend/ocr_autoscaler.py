@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import config
+from ocr_supervisor import SupervisedProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two looks at the pool's load
+SAMPLE_INTERVAL = 1.0
+# Service time assumed until the pool has completed a task
+DEFAULT_SERVICE_SECONDS = 1.0
+# Number of recent scaling decisions kept for metrics
+DECISION_HISTORY = 20
+
+
+class PoolAutoscaler:
+    """Grows and shrinks a supervised OCR pool with its queue.
+
+    Every second the autoscaler works out how many workers are needed:
+    enough to start every queued task within ``target_wait`` seconds at
+    the recent service time, and at least as many as are busy. The pool
+    grows once more are needed for ``up_delay`` seconds, straight to the
+    needed size. It shrinks only after ``down_delay`` seconds without a
+    change, to the peak need over that period, so a lull between bursts
+    doesn't throw away warm workers. Workers added are warmed up by the
+    pool before they take tasks.
+    """
+
+    def __init__(
+        self,
+        pool: SupervisedProcessPool,
+        min_workers: int,
+        max_workers: int,
+        target_wait: float = config.OCR_AUTOSCALE_TARGET_WAIT_SECONDS,
+        up_delay: float = config.OCR_AUTOSCALE_UP_SECONDS,
+        down_delay: float = config.OCR_AUTOSCALE_DOWN_SECONDS,
+    ):
+        self.pool = pool
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.target_wait = max(0.1, target_wait)
+        self.up_delay = up_delay
+        self.down_delay = down_delay
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=DECISION_HISTORY)
+        self.stats = {"scale_ups": 0, "scale_downs": 0}
+        self._needed: Deque[Tuple[float, int]] = deque()  # (time, workers needed) over the down delay
+        self._short_since: Optional[float] = None  # Since when more workers have been needed
+        self._last_change = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start sampling the pool"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ocr-autoscaler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop sampling; the pool keeps its current size"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        """Bounds, current load and recent decisions, for metrics"""
+        load = self.pool.load()
+        return {
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "target_wait_seconds": self.target_wait,
+            **load,
+            "needed": self._workers_needed(load),
+            **self.stats,
+            "decisions": list(self.decisions),
+        }
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            try:
+                self.step(time.monotonic())
+            except Exception as e:
+                logger.error(f"OCR autoscaling failed: {e}")
+
+    def step(self, now: float):
+        """Sample the pool once and resize it if the policy says so"""
+        load = self.pool.load()
+        size = load["size"]
+        needed = self._workers_needed(load)
+        self._needed.append((now, needed))
+        while self._needed[0][0] < now - self.down_delay:
+            self._needed.popleft()
+
+        if size < self.min_workers:
+            self._resize(now, size, self.min_workers, "below the minimum")
+            return
+
+        if needed > size and size < self.max_workers:
+            if self._short_since is None:
+                self._short_since = now
+            if now - self._short_since >= self.up_delay:
+                self._resize(
+                    now, size, needed,
+                    f"{load['queued']} task(s) queued at {self._service_seconds(load):.1f}s each",
+                )
+            return
+        self._short_since = None
+
+        if size > self.min_workers and now - self._last_change >= self.down_delay:
+            peak = max(workers for _, workers in self._needed)
+            if peak < size:
+                self._resize(now, size, peak, f"at most {peak} worker(s) needed in the last {self.down_delay:g}s")
+
+    def _workers_needed(self, load: Dict[str, Any]) -> int:
+        """Workers that start every queued task within the target wait, and no fewer than are busy"""
+        draining = math.ceil(load["queued"] * self._service_seconds(load) / self.target_wait)
+        return min(max(load["busy"], draining, self.min_workers), self.max_workers)
+
+    @staticmethod
+    def _service_seconds(load: Dict[str, Any]) -> float:
+        return load["service_seconds"] or DEFAULT_SERVICE_SECONDS
+
+    def _resize(self, now: float, size: int, workers: int, reason: str):
+        """Resize the pool and record the decision"""
+        workers = min(max(workers, self.min_workers), self.max_workers)
+        new_size = self.pool.resize(workers)
+        self._last_change = now
+        self._short_since = None
+        if new_size == size:
+            return
+        self.stats["scale_ups" if new_size > size else "scale_downs"] += 1
+        self.decisions.append({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "from": size,
+            "to": new_size,
+            "reason": reason,
+        })
+        logger.info(f"OCR pool scaled from {size} to {new_size} worker(s): {reason}")
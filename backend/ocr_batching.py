@@ -0,0 +1,190 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+if TYPE_CHECKING:
+    import easyocr
+
+logger = logging.getLogger(__name__)
+
+# EasyOCR result item: (box, text, confidence)
+OCRResult = Tuple[Any, str, float]
+
+
+@dataclass
+class _RecognitionRequest:
+    """Text crops of one image waiting to be recognised"""
+    crops: List[Tuple[Any, np.ndarray]]
+    max_width: int
+    decoder: Tuple[str, int]
+    future: Future = field(default_factory=Future)
+
+
+class RecognitionBatcher:
+    """Micro-batching scheduler for EasyOCR text recognition.
+
+    OCR workers still run text detection themselves, then hand the detected
+    crops to the batcher. A single scheduler thread gathers crops from all
+    in-flight images until ``max_batch_size`` crops are waiting or the
+    oldest request has waited ``max_wait_ms``, runs them through the
+    recognizer in one batch and routes each result back to its caller.
+    """
+
+    def __init__(
+        self,
+        reader_factory: Callable[[], "easyocr.Reader"],
+        max_batch_size: int = config.OCR_BATCH_MAX_SIZE,
+        max_wait_ms: float = config.OCR_BATCH_MAX_WAIT_MS,
+    ):
+        self.reader_factory = reader_factory
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"batches": 0, "requests": 0, "crops": 0}
+        self._reader: Optional["easyocr.Reader"] = None
+        self._queue: "queue.Queue[Optional[_RecognitionRequest]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._reader_lock = threading.Lock()
+
+    def start(self):
+        """Start the scheduler thread"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ocr-batcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread once the queued requests are recognised"""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def warm(self):
+        """Load the recognition reader"""
+        self._get_reader()
+
+    def readtext(
+        self,
+        reader: "easyocr.Reader",
+        image: np.ndarray,
+        decoder: str = "greedy",
+        beam_width: int = 5,
+        canvas_size: int = 2560,
+    ) -> List[OCRResult]:
+        """
+        Equivalent of ``reader.readtext(image)``, with detection run by the
+        calling worker's reader and recognition batched.
+        """
+        from easyocr import easyocr as easyocr_module
+        from easyocr.utils import get_image_list, reformat_input
+
+        img, img_cv_grey = reformat_input(image)
+        horizontal_list, free_list = reader.detect(img, canvas_size=canvas_size, reformat=False)
+        horizontal_list, free_list = horizontal_list[0], free_list[0]
+
+        # Same crop order as readtext on CPU: horizontal boxes, then free-form ones
+        crops: List[Tuple[Any, np.ndarray]] = []
+        max_width = 0
+        model_height = easyocr_module.imgH
+        for h_list, f_list in ((horizontal_list, []), ([], free_list)):
+            if h_list or f_list:
+                image_list, width = get_image_list(
+                    h_list, f_list, img_cv_grey, model_height=model_height, sort_output=False
+                )
+                crops += image_list
+                max_width = max(max_width, width)
+
+        return self.recognize(crops, max_width, decoder, beam_width)
+
+    def recognize(
+        self, crops: List[Tuple[Any, np.ndarray]], max_width: int, decoder: str = "greedy", beam_width: int = 5
+    ) -> List[OCRResult]:
+        """Queue text crops for recognition and wait for their results"""
+        if not crops:
+            return []
+        if self._thread is None:
+            self.start()
+        request = _RecognitionRequest(crops, max_width, (decoder, beam_width))
+        self._queue.put(request)
+        return request.future.result()
+
+    def _run(self):
+        """Gather requests into batches until stopped"""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            pending = [first]
+            crop_count = len(first.crops)
+            deadline = time.monotonic() + self.max_wait
+            while crop_count < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                pending.append(request)
+                crop_count += len(request.crops)
+
+            # A batch shares one decoder, so split by decoder settings
+            groups: Dict[Tuple[str, int], List[_RecognitionRequest]] = {}
+            for request in pending:
+                groups.setdefault(request.decoder, []).append(request)
+            for requests in groups.values():
+                self._recognize_batch(requests)
+
+    def _recognize_batch(self, requests: List[_RecognitionRequest]):
+        """Recognise the crops of several requests in one pass and hand back each share"""
+        from easyocr import easyocr as easyocr_module
+        from easyocr.recognition import get_text
+
+        try:
+            reader = self._get_reader()
+            decoder, beam_width = requests[0].decoder
+            image_list = [crop for request in requests for crop in request.crops]
+            max_width = max(request.max_width for request in requests)
+            ignore_char = "".join(set(reader.character) - set(reader.lang_char))
+
+            results = get_text(
+                reader.character, easyocr_module.imgH, int(max_width), reader.recognizer, reader.converter,
+                image_list, ignore_char, decoder, beam_width, self.max_batch_size,
+                0.1, 0.5, 0.003, 0, reader.device,
+            )
+        except Exception as e:
+            logger.error(f"Batched recognition failed: {e}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(requests)
+        self.stats["crops"] += len(image_list)
+
+        offset = 0
+        for request in requests:
+            request.future.set_result(results[offset:offset + len(request.crops)])
+            offset += len(request.crops)
+
+    def _get_reader(self) -> "easyocr.Reader":
+        """The reader whose recogniser runs the batches, loaded on first use"""
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = self.reader_factory()
+            return self._reader
@@ -0,0 +1,372 @@
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from cpu_layout import CPULayout
+from ocr_autoscaler import PoolAutoscaler
+from ocr_batching import RecognitionBatcher
+from ocr_supervisor import SupervisedProcessPool, current_slot
+
+if TYPE_CHECKING:
+    import easyocr
+
+logger = logging.getLogger(__name__)
+
+# Reader settings of the current process, set when a worker starts
+_reader_args: Optional[Tuple[List[str], bool]] = None
+
+# torch (intra-op, inter-op) threads of the current process (0 leaves torch's default)
+_torch_threads: Tuple[int, int] = (0, 0)
+
+# Reader loaded by the master process before forking the workers, shared copy-on-write
+_preloaded_reader: Optional["easyocr.Reader"] = None
+
+# Each worker (thread or process) keeps its own reader here
+_local = threading.local()
+
+# Cross-request recognition batcher shared by the thread workers, if enabled
+_batcher: Optional[RecognitionBatcher] = None
+
+# Processes parsing PDFs (text layers, page sizes) in process mode; parsing is quick
+PARSE_WORKERS = 1
+
+
+def _init_worker(
+    languages: List[str],
+    gpu: bool,
+    torch_threads: Tuple[int, int] = (0, 0),
+    cpu_sets: Optional[List[List[int]]] = None,
+):
+    """
+    Remember the reader settings; the reader itself is built on first use.
+    Process workers given CPU sets pin themselves to the one of their slot.
+    """
+    global _reader_args, _torch_threads
+    _reader_args = (languages, gpu)
+    _torch_threads = torch_threads
+    slot = current_slot()
+    if cpu_sets and slot is not None:
+        # Before torch starts its threads, so they inherit the affinity
+        os.sched_setaffinity(0, cpu_sets[slot % len(cpu_sets)])
+    if _preloaded_reader is not None:
+        # Forked from a master holding the reader: torch is already imported
+        _configure_torch()
+
+
+def _configure_torch():
+    """Apply the worker's torch thread counts"""
+    intra_op, inter_op = _torch_threads
+    if intra_op <= 0 and inter_op <= 0:
+        return
+
+    import torch
+
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Only settable once per process, before any inter-op work
+            pass
+
+
+def _warm_worker(barrier: Optional[threading.Barrier] = None) -> bool:
+    """Task used to force every worker to start and load its reader"""
+    if barrier is not None:
+        # Hold the thread until all workers are up so the executor spawns each of them
+        barrier.wait()
+    get_reader()
+    return True
+
+
+def _build_reader() -> "easyocr.Reader":
+    """Build an EasyOCR reader with the current process's settings"""
+    if _reader_args is None:
+        raise RuntimeError("get_reader() must be called from an OCR pool worker")
+
+    # Imported here: easyocr pulls in torch, which text-only extraction never needs
+    import easyocr
+
+    _configure_torch()
+    languages, gpu = _reader_args
+    return easyocr.Reader(languages, gpu=gpu)
+
+
+def _preload_reader(languages: List[str]) -> "easyocr.Reader":
+    """
+    Build the reader in the master process for the forked workers to inherit.
+    The models are switched to inference mode, with gradients off, so running
+    them never writes to the shared weight pages.
+    """
+    import torch
+
+    # Keep the master's torch single threaded: an OpenMP pool started before
+    # fork is not usable in the children
+    torch.set_num_threads(1)
+    _init_worker(languages, False)
+    reader = _build_reader()
+    for model in (reader.detector, reader.recognizer):
+        model.eval()
+        model.requires_grad_(False)
+    return reader
+
+
+def get_reader() -> "easyocr.Reader":
+    """Return the EasyOCR reader of the calling worker, loading it on first use"""
+    if _preloaded_reader is not None:
+        return _preloaded_reader
+    reader = getattr(_local, "reader", None)
+    if reader is None:
+        reader = _build_reader()
+        _local.reader = reader
+    return reader
+
+
+def get_batcher() -> Optional[RecognitionBatcher]:
+    """Return the recognition batcher available to the calling worker, if any"""
+    return _batcher
+
+
+class OCRWorkerPool:
+    """Pool of OCR workers, each owning its own EasyOCR reader.
+
+    Blocking OCR work is submitted with ``run`` and awaited, so the event loop
+    keeps serving requests while pages are being recognised. Readers are
+    loaded lazily by the worker that first needs one, or up front by ``warm``.
+
+    With ``preload`` (process mode on CPU), the reader is loaded once in this
+    process, which then forks the workers: they start warm and share the
+    model weights copy-on-write instead of each loading its own copy.
+
+    The CPU ``layout`` sets the default worker count and each worker's torch
+    thread counts, and optionally the CPUs each process worker is pinned to.
+
+    Process workers are supervised: they are recycled after ``max_tasks``
+    tasks or once their own memory passes ``max_memory_mb``, and a worker
+    that crashes only fails its task, after ``crash_retries`` retries in a
+    fresh worker. PDFs are parsed by a separate supervised process (see
+    ``parse``), so a malformed file can't bring down the API either.
+
+    In process mode ``workers`` is an upper bound: the pool starts with
+    ``min_workers`` and is resized with its queue by a ``PoolAutoscaler``.
+    Thread mode always runs ``workers`` threads.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        mode: str = config.OCR_POOL_MODE,
+        languages: Optional[List[str]] = None,
+        gpu: bool = config.OCR_USE_GPU,
+        batching: bool = config.OCR_BATCHING,
+        preload: bool = config.OCR_PRELOAD,
+        layout: CPULayout = config.OCR_CPU_LAYOUT,
+        max_tasks: int = config.OCR_WORKER_MAX_TASKS,
+        max_memory_mb: int = config.OCR_WORKER_MAX_MEMORY_MB,
+        crash_retries: int = config.OCR_WORKER_CRASH_RETRIES,
+        min_workers: int = config.OCR_POOL_MIN_WORKERS,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown OCR pool mode: {mode}")
+        self.layout = layout
+        self.workers = max(1, workers or layout.workers)
+        self.min_workers = min(max(1, min_workers), self.workers)
+        self.mode = mode
+        self.languages = languages or list(config.OCR_LANGUAGES)
+        self.gpu = gpu
+        # Cross-request recognition batching only works between threads of one process
+        self.batching = batching and mode == "thread"
+        # Forking shares weights between processes; CUDA contexts can't be forked
+        self.preload = preload and mode == "process" and not gpu
+        self.torch_threads = (layout.intra_op_threads, layout.inter_op_threads)
+        # Only processes can be pinned: torch's thread pool is shared by all threads of a process
+        self.pin = layout.pin and mode == "process" and hasattr(os, "sched_setaffinity")
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory_mb * 2**20
+        self.crash_retries = crash_retries
+        self.state = "cold"  # cold -> warming -> warm, or failed; warm after any successful OCR task
+        self.error: Optional[str] = None
+        self._executor: Optional[Executor] = None
+        self._parser: Optional[SupervisedProcessPool] = None
+        self._autoscaler: Optional[PoolAutoscaler] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the workers; only preload mode loads a reader, before forking them"""
+        global _batcher, _preloaded_reader
+        with self._lock:
+            if self._executor is not None:
+                return
+
+            initargs = (self.languages, self.gpu, self.torch_threads)
+            if self.pin:
+                initargs += (self.layout.cpu_sets,)
+            if self.mode == "process":
+                # Preloaded workers must be forked to inherit the reader, which is loaded
+                # before any pool thread exists. Otherwise workers start from a fork server:
+                # they are started from pool threads while the event loop, database and
+                # executor threads run, and a forked child could deadlock on their locks.
+                if self.preload:
+                    context = multiprocessing.get_context("fork")
+                elif "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                else:
+                    context = multiprocessing.get_context("spawn")
+                if self.preload:
+                    if _preloaded_reader is None:
+                        _preloaded_reader = _preload_reader(self.languages)
+                    # Move everything allocated so far out of the collector's reach, so
+                    # collections in the workers don't touch (and copy) the shared pages
+                    gc.freeze()
+                supervision = {
+                    "mp_context": context,
+                    "max_tasks": self.max_tasks,
+                    "max_memory": self.max_memory,
+                    "retries": self.crash_retries,
+                }
+                # The initial workers are started (forked, with preload) right away; those
+                # added later or replacing others load their reader before taking tasks
+                self._executor = SupervisedProcessPool(
+                    self.min_workers,
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=initargs,
+                    warmup=_warm_worker,
+                    **supervision,
+                )
+                self._parser = SupervisedProcessPool(PARSE_WORKERS, name="pdf-parser", **supervision)
+                if self.min_workers < self.workers:
+                    self._autoscaler = PoolAutoscaler(self._executor, self.min_workers, self.workers)
+                    self._autoscaler.start()
+            else:
+                if self.batching:
+                    # Thread workers share the process, so they can share one recognition batcher
+                    _init_worker(*initargs)
+                    _batcher = RecognitionBatcher(_build_reader)
+                    _batcher.start()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="ocr-worker",
+                    initializer=_init_worker,
+                    initargs=initargs,
+                )
+
+        intra_op, inter_op = self.torch_threads
+        scaling = f"{self.min_workers} to " if self._autoscaler is not None else ""
+        logger.info(
+            f"OCR pool started with {scaling}{self.workers} {self.mode} worker(s), "
+            f"{intra_op} intra-op / {inter_op} inter-op torch thread(s) each"
+            f"{', preloaded' if self.preload else ''}{', pinned' if self.pin else ''}"
+        )
+        logger.info(f"CPU layout: {self.layout.describe()}")
+        if self.layout.pin and not self.pin:
+            logger.warning("OCR_PIN_CPUS only applies to the process pool on Linux; workers are not pinned")
+
+    def warm(self):
+        """Load the reader of every worker; blocks until they are all loaded"""
+        self.start()
+        self.state = "warming"
+
+        # Process mode warms the workers running now; those added later warm themselves
+        workers = self._executor.size if isinstance(self._executor, SupervisedProcessPool) else self.workers
+        barrier = threading.Barrier(workers) if self.mode == "thread" else None
+        warmups = [self._executor.submit(_warm_worker, barrier) for _ in range(workers)]
+        try:
+            if _batcher is not None:
+                _batcher.warm()
+            for future in warmups:
+                future.result()
+        except Exception as e:
+            if barrier is not None:
+                # Release workers still parked on the barrier
+                barrier.abort()
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"OCR model warm-up failed: {e}")
+            return
+
+        self.state = "warm"
+        self.error = None
+        logger.info(f"OCR model warm in {workers} worker(s)")
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the pool for readiness checks"""
+        return {
+            "state": self.state,
+            "mode": self.mode,
+            "workers": self.workers,
+            "min_workers": self.min_workers if self.mode == "process" else self.workers,
+            "size": self._executor.size if isinstance(self._executor, SupervisedProcessPool) else self.workers,
+            "batching": _batcher is not None,
+            "preload": self.preload,
+            "torch_threads": {"intra_op": self.torch_threads[0], "inter_op": self.torch_threads[1]},
+            "cpus": self.layout.cpus,
+            "cpu_sets": self.layout.cpu_sets if self.pin else None,
+            "supervision": self.supervision_stats(),
+            "error": self.error,
+        }
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` on an OCR worker and await its result"""
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            # Starting may load the model (preload mode), so keep it off the event loop
+            await loop.run_in_executor(None, self.start)
+        result = await loop.run_in_executor(self._executor, fn, *args)
+        if self.state != "warm":
+            # The task loaded the model: without warm-up, or after a failed one
+            self.state = "warm"
+            self.error = None
+        return result
+
+    async def parse(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run ``fn(*args)``, a document parsing step that needs no OCR model, and
+        await its result. In process mode it runs in a supervised parser process,
+        so a file that crashes the parsing library only fails its own request.
+        """
+        loop = asyncio.get_running_loop()
+        if self.mode == "process" and self._parser is None:
+            await loop.run_in_executor(None, self.start)
+        return await loop.run_in_executor(self._parser, fn, *args)
+
+    def batching_stats(self) -> Optional[Dict[str, int]]:
+        """Counters of the recognition batcher, if batching is enabled"""
+        return dict(_batcher.stats) if _batcher is not None else None
+
+    def supervision_stats(self) -> Optional[Dict[str, Any]]:
+        """Worker processes, crashes and recycling of the OCR and parser processes, in process mode"""
+        if not isinstance(self._executor, SupervisedProcessPool):
+            return None
+        return {
+            "max_tasks": self.max_tasks,
+            "max_memory_mb": self.max_memory // 2**20,
+            "ocr": self._executor.status(),
+            "parser": self._parser.status() if self._parser is not None else None,
+            "autoscaling": self._autoscaler.status() if self._autoscaler is not None else None,
+        }
+
+    def shutdown(self):
+        """Stop the workers, letting in-flight jobs finish"""
+        global _batcher, _preloaded_reader
+        with self._lock:
+            if self._autoscaler is not None:
+                self._autoscaler.stop()
+                self._autoscaler = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._parser is not None:
+                self._parser.shutdown(wait=True)
+                self._parser = None
+            _preloaded_reader = None
+            if _batcher is not None:
+                _batcher.stop()
+                _batcher = None
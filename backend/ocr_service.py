@@ -1,28 +1,165 @@
+import io
 import os
 import re
+import math
+import time
 import asyncio
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 import logging
 
-import easyocr
 import cv2
 import numpy as np
 from PIL import Image
 from PyPDF2 import PdfReader
 import fitz  # PyMuPDF for PDF processing
 
-from models import ExtractedCredential
+import config
+from models import DocumentCost, ExtractedCredential, QualityTier
+from ocr_pool import OCRWorkerPool, get_batcher, get_reader
+from ocr_supervisor import WorkerCrashedError
+from pixel_budget import PixelBudget
+from quality import get_tier
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# An uploaded document, either stored on disk or still in memory
+Document = Union[Path, bytes]
+
+# JPEG decoding flags that downscale by 8, 4 or 2 in the decoder itself
+_REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+
+
+def _ocr_worker(image: Union[str, bytes, np.ndarray], tier: QualityTier) -> Tuple[str, float, Dict[str, Any]]:
+    """
+    Preprocess and OCR an image file, encoded image bytes or array; runs inside an OCR pool worker.
+    Returns the text, the average confidence and the preprocessing report.
+    """
+    # Preprocess image for better OCR results
+    processed_img, report = OCRService._preprocess_image(image, tier)
+    
+    # Perform OCR with the worker's EasyOCR reader, batching recognition across requests if enabled
+    started = time.perf_counter()
+    batcher = get_batcher()
+    if batcher is not None:
+        results = batcher.readtext(
+            get_reader(),
+            processed_img,
+            decoder=tier.decoder,
+            beam_width=tier.beam_width,
+            canvas_size=tier.max_image_side,
+        )
+    else:
+        results = get_reader().readtext(
+            processed_img,
+            decoder=tier.decoder,
+            beamWidth=tier.beam_width,
+            batch_size=tier.batch_size,
+            canvas_size=tier.max_image_side,
+        )
+    report['timings_ms']['readtext'] = _elapsed_ms(started)
+    
+    # Extract text and calculate average confidence
+    full_text = ""
+    total_confidence = 0.0
+    
+    for (bbox, text, confidence) in results:
+        full_text += text + " "
+        total_confidence += confidence
+    
+    avg_confidence = total_confidence / len(results) if results else 0.0
+    
+    return full_text.strip(), avg_confidence, report
+
+def _open_pdf(document: Document) -> fitz.Document:
+    """Open a PDF on disk or in memory"""
+    if isinstance(document, bytes):
+        return fitz.open(stream=document, filetype="pdf")
+    return fitz.open(str(document))
+
+def _render_scale(page: fitz.Page, pixel_budget: int, scale_bounds: Tuple[float, float]) -> float:
+    """Pick the zoom factor, within bounds, that renders a page closest to the pixel budget"""
+    min_scale, max_scale = scale_bounds
+    area = page.rect.width * page.rect.height
+    if area <= 0:
+        return max_scale
+    scale = math.sqrt(pixel_budget / area)
+    return min(max(scale, min_scale), max_scale)
+
+def _read_pdf_text(document: Document) -> List[str]:
+    """Text layer of every page of a PDF; runs in a parser process in process mode"""
+    with _open_pdf(document) as doc:
+        return [page.get_text() for page in doc]
+
+def _estimate_pdf_cost(
+    document: Document, pixel_budget: int, scale_bounds: Tuple[float, float], page_concurrency: int
+) -> DocumentCost:
+    """
+    OCR cost of a PDF from its page count, page sizes and text layers; runs in a parser
+    process in process mode. Peak pixels are those of the largest pages that can be
+    rendered at the same time. The text layers are returned with the cost, so
+    extraction doesn't have to read them again.
+    """
+    with _open_pdf(document) as doc:
+        page_texts = [page.get_text() for page in doc]
+        page_pixels = []
+        for page, text in zip(doc, page_texts):
+            # Pages with a text layer are read without rendering
+            if text.strip():
+                continue
+            scale = _render_scale(page, pixel_budget, scale_bounds)
+            page_pixels.append(int(page.rect.width * scale) * int(page.rect.height * scale))
+        largest = sorted(page_pixels, reverse=True)[:page_concurrency]
+        return DocumentCost(
+            pages=len(doc), ocr_pages=len(page_pixels), pixels=sum(page_pixels), peak_pixels=sum(largest),
+            text_layers=page_texts,
+        )
+
+def _ocr_page_worker(
+    document: Document, page_num: int, tier: QualityTier, scale_bounds: Tuple[float, float]
+) -> Tuple[str, float, Dict[str, Any]]:
+    """
+    Rasterize a scanned PDF page in memory and OCR it; runs inside an OCR pool worker.
+    Returns the text, the average confidence and the page report.
+    """
+    with _open_pdf(document) as doc:
+        page = doc[page_num]
+        # Render straight to 8-bit grayscale; OCR doesn't need color or alpha
+        scale = _render_scale(page, tier.page_pixel_budget, scale_bounds)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+        # The array may be a view of the pixmap buffer, so pix must outlive the OCR call
+        text, confidence, report = _ocr_worker(OCRService._pixmap_to_array(pix), tier)
+    info = {'source': 'ocr', 'scale': round(scale, 3), 'width': pix.width, 'height': pix.height, 'preprocessing': report}
+    return text, confidence, info
+
+def _elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
 class OCRService:
     """Advanced OCR service for extracting academic credentials"""
     
-    def __init__(self):
-        # Initialize EasyOCR reader with English support
-        self.reader = easyocr.Reader(['en'], gpu=False)  # Set gpu=True if CUDA available
+    def __init__(
+        self,
+        pool: Optional[OCRWorkerPool] = None,
+        page_concurrency: int = config.OCR_PAGE_CONCURRENCY,
+        budget: Optional[PixelBudget] = None,
+    ):
+        # EasyOCR readers live in the worker pool so inference never blocks the event loop
+        self.pool = pool or OCRWorkerPool()
+        # Maximum number of pages of one PDF being OCR'd at the same time
+        self.page_concurrency = max(1, page_concurrency)
+        # Documents reserve their estimated peak pixels here before being rendered and OCR'd
+        self.budget = budget or PixelBudget()
+        
+        # Scanned pages are rendered to about the tier's pixel budget, within these bounds
+        self.min_render_scale = config.OCR_MIN_RENDER_SCALE
+        self.max_render_scale = config.OCR_MAX_RENDER_SCALE
         
         # Patterns for extracting specific credential fields
         self.patterns = {
@@ -62,14 +199,42 @@ class OCRService:
             ]
         }
     
-    async def extract_credentials(self, file_path: Path) -> Dict[str, Any]:
-        """Main method to extract credentials from a file"""
+    async def extract_credentials(
+        self, file_path: Path, quality: Optional[str] = None, cost: Optional[DocumentCost] = None
+    ) -> Dict[str, Any]:
+        """
+        Main method to extract credentials from a file, using the given quality tier.
+        cost is the file's estimate from estimate_cost for that tier, if already known.
+        """
+        return await self._extract_credentials(file_path, file_path.suffix, quality, cost)
+    
+    async def extract_credentials_from_bytes(
+        self, data: bytes, file_extension: str, quality: Optional[str] = None, cost: Optional[DocumentCost] = None
+    ) -> Dict[str, Any]:
+        """Extract credentials from an uploaded file still held in memory, without reading it from disk"""
+        return await self._extract_credentials(data, file_extension, quality, cost)
+    
+    async def _extract_credentials(
+        self, document: Document, file_extension: str, quality: Optional[str], cost: Optional[DocumentCost]
+    ) -> Dict[str, Any]:
+        """Extract credentials from a file on disk or in memory"""
         try:
-            # Determine file type and extract text
-            if file_path.suffix.lower() == '.pdf':
-                raw_text, confidence = await self._extract_from_pdf(file_path)
-            else:
-                raw_text, confidence = await self._extract_from_image(file_path)
+            tier = get_tier(quality)
+            
+            # Pipeline details reported alongside the extracted fields
+            processing: Dict[str, Any] = {'quality': tier.name}
+            
+            # Wait for room in the memory budget; large documents may have to run alone
+            if cost is None:
+                cost = await self._estimate_cost(document, file_extension, tier)
+            processing['cost'] = cost.dict()
+            
+            async with self.budget.reserve(cost.peak_pixels):
+                # Determine file type and extract text
+                if file_extension.lower() == '.pdf':
+                    raw_text, confidence = await self._extract_from_pdf(document, tier, processing, cost.text_layers)
+                else:
+                    raw_text, confidence = await self._extract_from_image(document, tier, processing)
             
             # Parse structured data from raw text
             structured_data = self._parse_credentials(raw_text)
@@ -77,6 +242,7 @@ class OCRService:
             # Add metadata
             structured_data['raw_text'] = raw_text
             structured_data['confidence_score'] = confidence
+            structured_data['processing'] = processing
             
             return structured_data
             
@@ -84,57 +250,132 @@ class OCRService:
             logger.error(f"Error extracting credentials: {e}")
             raise e
     
-    async def _extract_from_pdf(self, file_path: Path) -> Tuple[str, float]:
-        """Extract text from PDF file"""
+    async def estimate_cost(
+        self, document: Document, file_extension: str, quality: Optional[str] = None
+    ) -> DocumentCost:
+        """Estimate the pixels a file on disk or in memory will put through OCR, without running it"""
+        return await self._estimate_cost(document, file_extension, get_tier(quality))
+    
+    async def _estimate_cost(self, document: Document, file_extension: str, tier: QualityTier) -> DocumentCost:
+        """
+        Estimate the OCR cost of a document from its headers: page count, page sizes
+        and text layers for PDFs, dimensions for images
+        """
         try:
-            # Try PyMuPDF first for better OCR
-            doc = fitz.open(str(file_path))
-            full_text = ""
-            total_confidence = 0.0
-            page_count = 0
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # First try to extract text directly (for text-based PDFs)
-                text = page.get_text()
-                if text.strip():
-                    full_text += text + "\n"
-                    total_confidence += 0.95  # High confidence for text extraction
-                else:
-                    # Convert page to image for OCR (for scanned PDFs)
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better OCR
-                    img_data = pix.tobytes("png")
-                    
-                    # Save temporarily for OCR processing
-                    temp_img_path = file_path.parent / f"temp_page_{page_num}.png"
-                    with open(temp_img_path, "wb") as img_file:
-                        img_file.write(img_data)
-                    
-                    # OCR the image
-                    page_text, page_confidence = await self._ocr_image(temp_img_path)
-                    full_text += page_text + "\n"
-                    total_confidence += page_confidence
-                    
-                    # Clean up temporary file
-                    temp_img_path.unlink(missing_ok=True)
-                
-                page_count += 1
+            if file_extension.lower() == '.pdf':
+                return await self.pool.parse(
+                    _estimate_pdf_cost, document, tier.page_pixel_budget, self._scale_bounds(), self.page_concurrency
+                )
+            return await asyncio.get_running_loop().run_in_executor(None, self._estimate_image_cost, document, tier)
+        
+        except WorkerCrashedError:
+            # The file kills the parser: fail it now rather than parse it again to extract it
+            raise
+        except Exception as e:
+            # Extraction will report the real problem; assume one page at the tier's budget
+            logger.warning(f"Could not estimate OCR cost: {e}")
+            return DocumentCost(ocr_pages=1, pixels=tier.page_pixel_budget, peak_pixels=tier.page_pixel_budget)
+    
+    def _estimate_image_cost(self, document: Document, tier: QualityTier) -> DocumentCost:
+        """OCR cost of an image from its dimensions; only the header is parsed"""
+        with Image.open(io.BytesIO(document) if isinstance(document, bytes) else document) as img:
+            width, height = img.size
+        reduction = 1
+        if isinstance(document, bytes) and document.startswith(b'\xff\xd8\xff'):
+            reduction = self._decode_reduction(width, height, tier.max_image_side)
+        pixels = (width // reduction) * (height // reduction)
+        return DocumentCost(pages=1, ocr_pages=1, pixels=pixels, peak_pixels=pixels)
+    
+    def _scale_bounds(self) -> Tuple[float, float]:
+        """Render scale bounds handed to the workers"""
+        return self.min_render_scale, self.max_render_scale
+    
+    async def _extract_from_pdf(
+        self, document: Document, tier: QualityTier, processing: Dict[str, Any], page_texts: Optional[List[str]] = None
+    ) -> Tuple[str, float]:
+        """Extract text from PDF file, given its text layers if they were read while estimating its cost"""
+        try:
+            # Try PyMuPDF first for better OCR; it runs in the workers, never in the API process
+            if page_texts is None:
+                page_texts = await self.pool.parse(_read_pdf_text, document)
+            page_results = await self._extract_pages(document, page_texts, tier, processing)
             
-            doc.close()
+            full_text = "".join(text + "\n" for text, _ in page_results)
+            total_confidence = sum(confidence for _, confidence in page_results)
+            page_count = len(page_results)
             
             avg_confidence = total_confidence / page_count if page_count > 0 else 0.0
             return full_text.strip(), avg_confidence
             
+        except WorkerCrashedError:
+            # The file kills PyMuPDF or the OCR worker: fail it rather than retry it elsewhere
+            raise
         except Exception as e:
             logger.error(f"Error processing PDF: {e}")
+            processing.pop('pages', None)
             # Fallback to PyPDF2
-            return await self._extract_from_pdf_fallback(file_path)
+            return await self._extract_from_pdf_fallback(document)
+    
+    async def _extract_pages(
+        self, document: Document, page_texts: List[str], tier: QualityTier, processing: Dict[str, Any]
+    ) -> List[Tuple[str, float]]:
+        """
+        Extract text and confidence of every page, in page order, given their text layers.
+        Scanned pages are OCR'd concurrently, at most page_concurrency at a time.
+        """
+        page_results: List[Optional[Tuple[str, float]]] = [None] * len(page_texts)
+        page_info: List[Dict[str, Any]] = [{'page': page_num + 1} for page_num in range(len(page_texts))]
+        processing['pages'] = page_info
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        
+        async def ocr_page(page_num: int):
+            async with semaphore:
+                page_results[page_num] = await self._ocr_pdf_page(document, page_num, tier, page_info[page_num])
+        
+        pending = []
+        for page_num, text in enumerate(page_texts):
+            # First try to extract text directly (for text-based PDFs)
+            if text.strip():
+                page_results[page_num] = (text, 0.95)  # High confidence for text extraction
+                page_info[page_num]['source'] = 'text'
+            else:
+                # Convert page to image for OCR (for scanned PDFs)
+                pending.append(asyncio.ensure_future(ocr_page(page_num)))
+        
+        try:
+            await asyncio.gather(*pending)
+        except Exception:
+            # Don't leave the other pages of a failed document running
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+        
+        return page_results
+    
+    async def _ocr_pdf_page(
+        self, document: Document, page_num: int, tier: QualityTier, page_info: Dict[str, Any]
+    ) -> Tuple[str, float]:
+        """Rasterize a scanned PDF page and OCR it in a worker, recording the page report in page_info"""
+        text, confidence, info = await self.pool.run(_ocr_page_worker, document, page_num, tier, self._scale_bounds())
+        page_info.update(info)
+        return text, confidence
     
-    async def _extract_from_pdf_fallback(self, file_path: Path) -> Tuple[str, float]:
+    @staticmethod
+    def _pixmap_to_array(pix: fitz.Pixmap) -> np.ndarray:
+        """Wrap a pixmap's samples in a grayscale array, without copying when already gray"""
+        samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+        img = samples.reshape(pix.height, pix.stride)[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+        
+        if pix.n <= 2:
+            # Grayscale, possibly with alpha
+            return np.ascontiguousarray(img[:, :, 0])
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY if pix.n == 4 else cv2.COLOR_RGB2GRAY)
+    
+    async def _extract_from_pdf_fallback(self, document: Document) -> Tuple[str, float]:
         """Fallback PDF text extraction using PyPDF2"""
         try:
-            with open(file_path, 'rb') as file:
+            with (io.BytesIO(document) if isinstance(document, bytes) else open(document, 'rb')) as file:
                 pdf_reader = PdfReader(file)
                 full_text = ""
                 
@@ -148,63 +389,174 @@ class OCRService:
             logger.error(f"PDF fallback extraction failed: {e}")
             raise e
     
-    async def _extract_from_image(self, file_path: Path) -> Tuple[str, float]:
+    async def _extract_from_image(self, document: Document, tier: QualityTier, processing: Dict[str, Any]) -> Tuple[str, float]:
         """Extract text from image file"""
-        return await self._ocr_image(file_path)
+        return await self._ocr_image(document, tier, processing)
     
-    async def _ocr_image(self, file_path: Path) -> Tuple[str, float]:
-        """Perform OCR on image file"""
+    async def _ocr_image(
+        self, image: Union[Path, bytes, np.ndarray], tier: QualityTier, info: Dict[str, Any]
+    ) -> Tuple[str, float]:
+        """Perform OCR on an image file, encoded image bytes or an array, recording the preprocessing report in info"""
         try:
-            # Preprocess image for better OCR results
-            processed_img = self._preprocess_image(str(file_path))
-            
-            # Perform OCR with EasyOCR
-            results = self.reader.readtext(processed_img)
-            
-            # Extract text and calculate average confidence
-            full_text = ""
-            total_confidence = 0.0
-            
-            for (bbox, text, confidence) in results:
-                full_text += text + " "
-                total_confidence += confidence
-            
-            avg_confidence = total_confidence / len(results) if results else 0.0
-            
-            return full_text.strip(), avg_confidence
+            if isinstance(image, Path):
+                image = str(image)
+            text, confidence, info['preprocessing'] = await self.pool.run(_ocr_worker, image, tier)
+            return text, confidence
             
         except Exception as e:
             logger.error(f"OCR processing failed: {e}")
             raise e
     
-    def _preprocess_image(self, image_path: str) -> np.ndarray:
-        """Preprocess image for better OCR results"""
+    @staticmethod
+    def _load_image(image_path: str) -> np.ndarray:
+        """Load an image file as a BGR array"""
+        img = cv2.imread(image_path)
+        if img is None:
+            # Try with PIL if cv2 fails
+            pil_img = Image.open(image_path)
+            img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+        return img
+    
+    @staticmethod
+    def _decode_reduction(width: int, height: int, max_side: int) -> int:
+        """Largest JPEG decode reduction (8, 4 or 2) that keeps at least max_side pixels on the longest side"""
+        for reduction in _REDUCED_GRAYSCALE_FLAGS:
+            if max(width, height) // reduction >= max_side:
+                return reduction
+        return 1
+    
+    @staticmethod
+    def _decode_image(data: bytes, max_side: int) -> np.ndarray:
+        """
+        Decode an in-memory image file straight to grayscale.
+        JPEGs much larger than max_side are decoded at 1/2, 1/4 or 1/8 scale,
+        keeping at least max_side pixels on the longest side.
+        """
+        flags = cv2.IMREAD_GRAYSCALE
+        if data.startswith(b'\xff\xd8\xff'):
+            # PIL only parses the header here
+            width, height = Image.open(io.BytesIO(data)).size
+            flags = _REDUCED_GRAYSCALE_FLAGS.get(
+                OCRService._decode_reduction(width, height, max_side), cv2.IMREAD_GRAYSCALE
+            )
+        
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        if img is None:
+            # Try with PIL if cv2 fails
+            img = np.array(Image.open(io.BytesIO(data)).convert('L'))
+        return img
+    
+    @staticmethod
+    def _preprocess_image(image: Union[str, bytes, np.ndarray], tier: QualityTier) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Preprocess an image file, encoded image bytes, BGR array or grayscale array for better OCR results,
+        as configured by the quality tier.
+        Returns the processed image and a report of the profile used and step timings.
+        """
+        report: Dict[str, Any] = {'profile': None, 'timings_ms': {}}
+        timings = report['timings_ms']
         try:
             # Load image
-            img = cv2.imread(image_path)
-            if img is None:
-                # Try with PIL if cv2 fails
-                pil_img = Image.open(image_path)
-                img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+            started = time.perf_counter()
+            if isinstance(image, str):
+                img = OCRService._load_image(image)
+            elif isinstance(image, bytes):
+                img = OCRService._decode_image(image, tier.max_image_side)
+            else:
+                img = image
             
             # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            
+            # Downscale images larger than the tier allows
+            longest_side = max(gray.shape[:2])
+            if longest_side > tier.max_image_side:
+                factor = tier.max_image_side / longest_side
+                gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+                report['resized_to'] = [gray.shape[1], gray.shape[0]]
+            timings['load'] = _elapsed_ms(started)
+            
+            # Measure the image to pick a preprocessing profile, unless the tier fixes one
+            quality = None
+            profile = tier.preprocessing
+            if profile == 'auto':
+                started = time.perf_counter()
+                quality = OCRService._probe_image_quality(gray)
+                profile = OCRService._choose_profile(quality)
+                report.update(quality)
+                timings['probe'] = _elapsed_ms(started)
+            report['profile'] = profile
             
-            # Apply denoising
-            denoised = cv2.fastNlMeansDenoising(gray)
+            # Apply denoising; clean scans skip it, mildly noisy ones use a small search window
+            started = time.perf_counter()
+            if profile == 'denoise':
+                denoised = cv2.fastNlMeansDenoising(gray)
+            elif profile == 'light':
+                denoised = cv2.fastNlMeansDenoising(gray, None, 3, 7, 7)
+            else:
+                denoised = gray
+            timings['denoise'] = _elapsed_ms(started)
+            
+            # Stretch faint scans to the full range before thresholding
+            if quality and quality['contrast'] < config.OCR_LOW_CONTRAST:
+                started = time.perf_counter()
+                denoised = cv2.normalize(denoised, None, 0, 255, cv2.NORM_MINMAX)
+                report['contrast_stretched'] = True
+                timings['normalize'] = _elapsed_ms(started)
             
             # Apply adaptive thresholding
+            started = time.perf_counter()
             processed = cv2.adaptiveThreshold(
                 denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
             )
+            timings['threshold'] = _elapsed_ms(started)
             
-            return processed
+            return processed, report
             
         except Exception as e:
             logger.error(f"Image preprocessing failed: {e}")
+            report['profile'] = 'none'
             # Return original image if preprocessing fails
-            img = cv2.imread(image_path)
-            return img if img is not None else np.array([])
+            if isinstance(image, np.ndarray):
+                return image, report
+            if isinstance(image, bytes):
+                img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                img = cv2.imread(image)
+            return (img if img is not None else np.array([])), report
+    
+    @staticmethod
+    def _probe_image_quality(gray: np.ndarray) -> Dict[str, float]:
+        """
+        Cheap image quality measurements on a central crop of a grayscale image:
+        noise (estimated sigma, in gray levels), sharpness (Laplacian variance)
+        and contrast (standard deviation).
+        """
+        height, width = gray.shape[:2]
+        size = config.OCR_PROBE_SIZE
+        top, left = max(0, (height - size) // 2), max(0, (width - size) // 2)
+        crop = gray[top:top + size, left:left + size]
+        
+        # Immerkaer's noise estimation, using the median absolute response so text edges don't count as noise
+        kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+        response = cv2.filter2D(crop.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+        noise = float(np.median(np.abs(response))) / (6 * 0.6745) if response.size else 0.0
+        
+        return {
+            'noise': round(noise, 2),
+            'sharpness': round(float(cv2.Laplacian(crop, cv2.CV_64F).var()), 1),
+            'contrast': round(float(crop.std()), 1),
+        }
+    
+    @staticmethod
+    def _choose_profile(quality: Dict[str, float]) -> str:
+        """Pick the preprocessing profile for the measured image quality"""
+        if quality['noise'] < config.OCR_NOISE_LIGHT:
+            return 'clean'
+        if quality['noise'] < config.OCR_NOISE_HEAVY or quality['sharpness'] < config.OCR_BLUR_SHARPNESS:
+            # Heavy denoising would only blur an already soft image further
+            return 'light'
+        return 'denoise'
     
     def _parse_credentials(self, raw_text: str) -> Dict[str, Any]:
         """Parse structured credential data from raw text"""
@@ -0,0 +1,448 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from multiprocessing import connection
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a retiring worker gets to exit before it is terminated
+STOP_TIMEOUT = 10
+
+# Seconds between checks, while idle, that the master process is still alive
+PARENT_CHECK_INTERVAL = 1.0
+
+# Number of recent task durations the service time is averaged over
+SERVICE_SAMPLES = 50
+
+# Queued to make one worker retire when the pool shrinks
+_RETIRE = object()
+
+# Slot of the current worker process, set when it starts
+_slot: Optional[int] = None
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised for a task whose worker process died while running it, on every attempt"""
+
+
+def current_slot() -> Optional[int]:
+    """Slot of the calling worker process, or None outside a supervised worker"""
+    return _slot
+
+
+def _private_memory() -> int:
+    """
+    Bytes of memory owned by this process. Pages shared with the master (the
+    preloaded model) are not counted, so only the worker's own growth is.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            return sum(
+                int(line.split()[1]) * 1024 for line in smaps if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        # Resident set size, shared pages included
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _worker_main(
+    conn: Connection,
+    slot: int,
+    initializer: Optional[Callable[..., Any]],
+    initargs: Tuple[Any, ...],
+    warmup: Optional[Callable[[], Any]],
+):
+    """Run tasks sent by the supervisor until told to stop or the master goes away"""
+    global _slot
+    _slot = slot
+    # Ctrl-C reaches the whole process group; the master stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    parent = os.getppid()
+
+    if initializer is not None:
+        initializer(*initargs)
+    if warmup is not None:
+        warmup()
+    conn.send(("ready", None, _private_memory()))
+
+    while True:
+        while not conn.poll(PARENT_CHECK_INTERVAL):
+            if os.getppid() != parent:
+                return
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        fn, args = task
+        try:
+            reply = ("ok", fn(*args))
+        except BaseException as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply + (_private_memory(),))
+        except Exception as e:
+            # The result or exception could not be pickled
+            conn.send(("error", RuntimeError(f"Could not return the result of {fn.__name__}: {e}"), _private_memory()))
+
+
+@dataclass
+class _Task:
+    """A submitted call waiting for a worker"""
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...]
+    future: Future
+    attempts: int = 0
+
+
+class _WorkerProcess:
+    """One worker process and the supervisor's end of its pipe"""
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.tasks = 0
+        self.memory = 0
+
+    def stop(self) -> Optional[int]:
+        """Ask the worker to exit, terminating it if it doesn't; returns its exit code"""
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(STOP_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        return self.process.exitcode
+
+
+class SupervisedProcessPool(Executor):
+    """Process pool whose workers are watched, recycled and replaced.
+
+    Each worker slot is served by a supervisor thread that hands its process
+    one task at a time. A worker that has run ``max_tasks`` tasks, or whose
+    own memory has grown past ``max_memory`` bytes, is retired after its
+    task and replaced by a fresh one. A worker that dies mid-task (a
+    segfault in a native library, the OOM killer) fails only that task: the
+    process is replaced and the task retried up to ``retries`` times, then
+    failed with ``WorkerCrashedError``. Other tasks and the master process
+    are unaffected.
+
+    Workers run ``initializer(*initargs)`` when they start; replacement
+    workers, and those added by ``resize``, also run ``warmup`` before
+    taking tasks, so the next task doesn't pay for it.
+
+    The pool starts ``workers`` processes and can be resized between 1 and
+    ``max_workers``; ``load`` reports what a scaling policy needs.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+        warmup: Optional[Callable[[], Any]] = None,
+        max_tasks: int = 0,
+        max_memory: int = 0,
+        retries: int = 1,
+        name: str = "ocr-worker",
+        max_workers: Optional[int] = None,
+    ):
+        workers = max(1, workers)
+        self.max_workers = max(workers, max_workers or 0)
+        self.context = mp_context or multiprocessing.get_context()
+        self.initializer = initializer
+        self.initargs = initargs
+        self.warmup = warmup
+        self.max_tasks = max_tasks
+        self.max_memory = max_memory
+        self.retries = max(0, retries)
+        self.name = name
+        self.stats = {"tasks": 0, "crashes": 0, "retries": 0, "failed": 0, "recycled_tasks": 0, "recycled_memory": 0}
+        self.busy = 0  # Tasks being run
+        self.pending = 0  # Tasks waiting for a worker
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._processes: List[Optional[_WorkerProcess]] = [None] * self.max_workers
+        self._threads: Dict[int, threading.Thread] = {}
+        self._warming: Set[int] = set()
+        self._retiring = 0  # Workers asked to retire that haven't yet
+        self._service_times: "deque[float]" = deque(maxlen=SERVICE_SAMPLES)
+        self._lock = threading.Lock()
+        # Pipes are created and their child ends closed under this lock, so that no
+        # worker forked meanwhile inherits another worker's end
+        self._spawn_lock = threading.Lock()
+        self._shutdown = False
+
+        # Start the initial workers now, from the calling thread
+        for slot in range(workers):
+            self._processes[slot] = self._spawn(slot, warm=False)
+        with self._lock:
+            for slot in range(workers):
+                self._start_slot(slot, warm=False)
+
+    @property
+    def size(self) -> int:
+        """Number of workers, counting those still warming up"""
+        return len(self._threads) - self._retiring
+
+    def resize(self, workers: int) -> int:
+        """
+        Grow or shrink the pool towards ``workers`` (within 1 and max_workers)
+        and return the new size. New workers are warmed up before they take
+        tasks; retiring ones finish the task they are running.
+        """
+        with self._lock:
+            if self._shutdown:
+                return self.size
+            target = min(max(1, workers), self.max_workers)
+            while self.size < target:
+                if self._retiring:
+                    # Cancel a retirement that hasn't happened yet
+                    self._retiring -= 1
+                    continue
+                self._start_slot(next(slot for slot in range(self.max_workers) if slot not in self._threads), warm=True)
+            if self.size > target:
+                for _ in range(self.size - target):
+                    self._retiring += 1
+                    self._queue.put(_RETIRE)
+            return self.size
+
+    def load(self) -> Dict[str, Any]:
+        """Current size, busy and queued tasks, and the recent mean service time in seconds"""
+        service_times = list(self._service_times)
+        return {
+            "size": self.size,
+            "warming": len(self._warming),
+            "busy": self.busy,
+            "queued": self.pending,
+            "service_seconds": sum(service_times) / len(service_times) if service_times else None,
+        }
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        """Schedule ``fn(*args)`` on the next free worker"""
+        if kwargs:
+            raise TypeError("SupervisedProcessPool.submit() takes positional arguments only")
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        future: Future = Future()
+        with self._lock:
+            self.pending += 1
+        self._queue.put(_Task(fn, args, future))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Stop the workers once the queued tasks are done (or cancelled)"""
+        if self._shutdown:
+            return
+        self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(task, _Task):
+                    self.pending -= 1
+                    task.future.cancel()
+        with self._lock:
+            threads = list(self._threads.values())
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def status(self) -> Dict[str, Any]:
+        """Worker processes and supervision counters"""
+        return {
+            "size": self.size,
+            "warming": len(self._warming),
+            "processes": [
+                {
+                    "slot": slot,
+                    "pid": worker.process.pid,
+                    "tasks": worker.tasks,
+                    "memory_mb": worker.memory // 2**20,
+                }
+                for slot, worker in enumerate(self._processes)
+                if worker is not None
+            ],
+            **self.stats,
+        }
+
+    def _start_slot(self, slot: int, warm: bool):
+        """Start the supervisor thread of a slot; called with the lock held"""
+        if warm:
+            self._warming.add(slot)
+        thread = threading.Thread(
+            target=self._serve, args=(slot, warm), name=f"{self.name}-supervisor-{slot}", daemon=True
+        )
+        self._threads[slot] = thread
+        thread.start()
+
+    def _spawn(self, slot: int, warm: bool) -> Optional[_WorkerProcess]:
+        """Start a worker process and wait until it is ready to take tasks"""
+        with self._spawn_lock:
+            conn, child_conn = self.context.Pipe()
+            process = self.context.Process(
+                target=_worker_main,
+                args=(child_conn, slot, self.initializer, self.initargs, self.warmup if warm else None),
+                name=f"{self.name}-{slot}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+
+        worker = _WorkerProcess(process, conn)
+        reply = self._receive(worker)
+        if reply is None:
+            logger.error(f"{self.name} {slot} (pid {process.pid}) died while starting, exit code {worker.stop()}")
+            return None
+        worker.memory = reply[2]
+        return worker
+
+    @staticmethod
+    def _receive(worker: _WorkerProcess) -> Optional[Tuple[str, Any, int]]:
+        """Wait for the worker's next message; None if it died first"""
+        ready = connection.wait([worker.conn, worker.process.sentinel])
+        if worker.conn not in ready:
+            return None
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            return None
+
+    def _serve(self, slot: int, warm: bool):
+        """Feed queued tasks to this slot's worker, replacing it as needed"""
+        if warm:
+            # A worker added by resize is ready before it takes its first task
+            self._processes[slot] = self._spawn(slot, warm=True)
+            self._warming.discard(slot)
+
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            if task is _RETIRE:
+                with self._lock:
+                    if not self._retiring:
+                        # Cancelled by a later resize
+                        continue
+                    self._retiring -= 1
+                    # Free the slot in the same step, so the size stays right
+                    worker = self._release(slot)
+                if worker is not None:
+                    worker.stop()
+                return
+
+            with self._lock:
+                self.pending -= 1
+                self.busy += 1
+            started = time.monotonic()
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    self._run(slot, task)
+                    self._service_times.append(time.monotonic() - started)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+
+        with self._lock:
+            worker = self._release(slot)
+        if worker is not None:
+            worker.stop()
+
+    def _release(self, slot: int) -> Optional[_WorkerProcess]:
+        """Free a slot and return its worker, to be stopped; called with the lock held"""
+        worker = self._processes[slot]
+        self._processes[slot] = None
+        self._threads.pop(slot, None)
+        return worker
+
+    def _run(self, slot: int, task: _Task):
+        """Run a task, retrying it in a fresh worker if its worker dies"""
+        while True:
+            worker = self._processes[slot]
+            if worker is not None and not worker.process.is_alive():
+                # Died while idle: not this task's doing
+                logger.warning(f"{self.name} {slot} (pid {worker.process.pid}) died while idle, exit code {worker.stop()}")
+                worker = None
+            if worker is None:
+                worker = self._processes[slot] = self._spawn(slot, warm=True)
+                if worker is None:
+                    self.stats["failed"] += 1
+                    task.future.set_exception(WorkerCrashedError(f"Could not start {self.name} {slot}"))
+                    return
+
+            try:
+                worker.conn.send((task.fn, task.args))
+            except (OSError, EOFError):
+                reply = None
+            except Exception as e:
+                # The task itself could not be pickled
+                task.future.set_exception(e)
+                return
+            else:
+                reply = self._receive(worker)
+
+            if reply is not None:
+                break
+
+            exitcode = worker.stop()
+            self._processes[slot] = None
+            self.stats["crashes"] += 1
+            task.attempts += 1
+            logger.error(
+                f"{self.name} {slot} (pid {worker.process.pid}) died running {task.fn.__name__}, "
+                f"exit code {exitcode} (attempt {task.attempts})"
+            )
+            if task.attempts > self.retries:
+                self.stats["failed"] += 1
+                task.future.set_exception(
+                    WorkerCrashedError(f"{self.name} died running {task.fn.__name__} (exit code {exitcode})")
+                )
+                return
+            self.stats["retries"] += 1
+
+        status, value, worker.memory = reply
+        worker.tasks += 1
+        self.stats["tasks"] += 1
+        if status == "ok":
+            task.future.set_result(value)
+        else:
+            task.future.set_exception(value)
+
+        # Recycle after the task, so its caller doesn't wait for the replacement
+        reason = None
+        if self.max_tasks and worker.tasks >= self.max_tasks:
+            reason = "tasks"
+        elif self.max_memory and worker.memory > self.max_memory:
+            reason = "memory"
+        if reason is not None and not self._shutdown:
+            logger.info(
+                f"Recycling {self.name} {slot} (pid {worker.process.pid}) after {worker.tasks} task(s), "
+                f"{worker.memory // 2**20} MB"
+            )
+            self.stats[f"recycled_{reason}"] += 1
+            worker.stop()
+            self._processes[slot] = self._spawn(slot, warm=True)
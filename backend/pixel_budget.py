@@ -0,0 +1,108 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List
+
+import config
+
+
+@dataclass
+class _Reservation:
+    """A document waiting for its share of the budget"""
+    cost: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class PixelBudget:
+    """Weighted admission of OCR work against a global pixel budget.
+
+    Each document reserves its estimated peak pixel count before it is
+    rendered and recognised, and releases it when done. Waiting documents
+    are admitted in arrival order, but smaller ones that fit may go ahead of
+    a large one, unless it has been waiting for ``max_bypass_seconds``. A
+    document costing more than the whole budget runs alone.
+    """
+
+    def __init__(
+        self,
+        capacity: int = config.OCR_PIXEL_BUDGET,
+        max_bypass_seconds: float = config.OCR_BUDGET_MAX_BYPASS_SECONDS,
+    ):
+        self.capacity = max(1, capacity)
+        self.max_bypass_seconds = max_bypass_seconds
+        self.in_use = 0
+        self.running = 0
+        self.stats = {"reservations": 0, "waited": 0, "oversized": 0}
+        self._waiting: List[_Reservation] = []
+
+    @asynccontextmanager
+    async def reserve(self, cost: int) -> AsyncIterator[None]:
+        """Hold ``cost`` pixels of the budget for the duration of the block"""
+        if cost > self.capacity:
+            self.stats["oversized"] += 1
+        cost = min(max(0, cost), self.capacity)
+        await self._acquire(cost)
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+    def status(self) -> Dict[str, Any]:
+        """Budget usage for metrics"""
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "running": self.running,
+            "waiting": len(self._waiting),
+            "waiting_pixels": sum(reservation.cost for reservation in self._waiting),
+            **self.stats,
+        }
+
+    async def _acquire(self, cost: int):
+        """Wait until the reservation is granted"""
+        self.stats["reservations"] += 1
+        reservation = _Reservation(cost)
+        self._waiting.append(reservation)
+        self._admit_waiting()
+        if reservation.granted.is_set():
+            return
+
+        self.stats["waited"] += 1
+        try:
+            await reservation.granted.wait()
+        except asyncio.CancelledError:
+            if reservation in self._waiting:
+                self._waiting.remove(reservation)
+                # It may have been holding back the documents behind it
+                self._admit_waiting()
+            else:
+                # Granted just before being cancelled
+                self._release(cost)
+            raise
+
+    def _release(self, cost: int):
+        """Return pixels to the budget and admit the waiting documents that now fit"""
+        self.in_use -= cost
+        self.running -= 1
+        self._admit_waiting()
+
+    def _admit_waiting(self):
+        """Grant waiting reservations in order, letting smaller ones past a large one for a while"""
+        now = time.monotonic()
+        for reservation in list(self._waiting):
+            if self._fits(reservation.cost):
+                self._waiting.remove(reservation)
+                self._grant(reservation.cost)
+                reservation.granted.set()
+            elif now - reservation.enqueued_at >= self.max_bypass_seconds:
+                # Starving: hold everything behind it until it fits
+                break
+
+    def _fits(self, cost: int) -> bool:
+        return self.in_use + cost <= self.capacity
+
+    def _grant(self, cost: int):
+        self.in_use += cost
+        self.running += 1
@@ -0,0 +1,72 @@
+import json
+import logging
+from typing import Dict, Optional
+
+import config
+from models import QualityTier
+
+logger = logging.getLogger(__name__)
+
+# Built-in tiers; "balanced" matches the pipeline used before tiers existed
+DEFAULT_TIERS: Dict[str, QualityTier] = {
+    "fast": QualityTier(
+        name="fast",
+        page_pixel_budget=1_000_000,
+        preprocessing="clean",
+        decoder="greedy",
+        batch_size=8,
+        max_image_side=1600,
+    ),
+    "balanced": QualityTier(
+        name="balanced",
+        page_pixel_budget=config.OCR_PAGE_PIXEL_BUDGET,
+        preprocessing="auto",
+        decoder="greedy",
+        batch_size=1,
+        max_image_side=2560,
+    ),
+    "accurate": QualityTier(
+        name="accurate",
+        page_pixel_budget=4_000_000,
+        preprocessing="auto",
+        decoder="beamsearch",
+        beam_width=5,
+        batch_size=1,
+        max_image_side=3200,
+    ),
+}
+
+
+def load_tiers(path: Optional[str] = config.OCR_QUALITY_TIERS_FILE) -> Dict[str, QualityTier]:
+    """
+    Load the quality tiers: the built-in ones, overridden or extended by a JSON file
+    mapping tier names to knobs, e.g. {"fast": {"batch_size": 16}, "bulk": {...}}.
+    New tiers start from the default tier's knobs.
+    """
+    tiers = dict(DEFAULT_TIERS)
+    if not path:
+        return tiers
+
+    with open(path) as tiers_file:
+        overrides = json.load(tiers_file)
+
+    for name, knobs in overrides.items():
+        base = tiers.get(name, tiers[config.OCR_DEFAULT_QUALITY])
+        tiers[name] = QualityTier(**{**base.dict(), **knobs, "name": name})
+
+    logger.info(f"Loaded OCR quality tiers from {path}: {sorted(tiers)}")
+    return tiers
+
+
+QUALITY_TIERS = load_tiers()
+
+if config.OCR_DEFAULT_QUALITY not in QUALITY_TIERS:
+    raise ValueError(f"Default OCR quality tier {config.OCR_DEFAULT_QUALITY} is not defined")
+
+
+def get_tier(name: Optional[str] = None) -> QualityTier:
+    """Get a quality tier by name, or the default tier"""
+    name = name or config.OCR_DEFAULT_QUALITY
+    if name not in QUALITY_TIERS:
+        raise ValueError(f"Unknown quality tier {name}. Available tiers: {sorted(QUALITY_TIERS)}")
+    return QUALITY_TIERS[name]
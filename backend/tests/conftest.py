@@ -0,0 +1,35 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules are imported as top-level modules, as main.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """A client of the app, with its database and uploads in a temporary directory"""
+    from fastapi.testclient import TestClient
+
+    import config
+
+    # main creates ../uploads and ../database when imported; keep them out of the checkout
+    workdir = tmp_path / "backend"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    # The services hold asyncio primitives bound to the loop they first ran on,
+    # so every client gets fresh ones
+    main = importlib.reload(sys.modules["main"]) if "main" in sys.modules else importlib.import_module("main")
+
+    uploads = tmp_path / "uploads"
+    uploads.mkdir(exist_ok=True)
+    monkeypatch.setattr(main, "UPLOAD_DIR", uploads)
+    monkeypatch.setattr(main.database, "db_path", tmp_path / "credentials.db")
+    monkeypatch.setattr(config, "OCR_WARMUP", False)
+    for counter in main.cache_stats:
+        monkeypatch.setitem(main.cache_stats, counter, 0)
+
+    with TestClient(main.app) as client:
+        yield client
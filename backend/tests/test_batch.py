@@ -0,0 +1,92 @@
+import io
+import json
+import struct
+import zipfile
+
+import fitz
+
+
+def _text_pdf(text):
+    """A one-page PDF with a text layer, which is extracted without the OCR model"""
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), text)
+    return document.tobytes()
+
+
+def _archive(members, encrypted=(), compression=None):
+    """
+    A ZIP archive of the given members. Those named in encrypted are flagged as
+    encrypted, and compression maps names to a (bogus) compression method.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    data = bytearray(buffer.getvalue())
+    compression = compression or {}
+
+    def patch(flags_at, method_at, name):
+        if name in encrypted:
+            struct.pack_into("<H", data, flags_at, struct.unpack_from("<H", data, flags_at)[0] | 0x1)
+        if name in compression:
+            struct.pack_into("<H", data, method_at, compression[name])
+
+    for offset in _offsets(data, b"PK\x03\x04"):
+        name_length = struct.unpack_from("<H", data, offset + 26)[0]
+        patch(offset + 6, offset + 8, data[offset + 30:offset + 30 + name_length].decode())
+    for offset in _offsets(data, b"PK\x01\x02"):
+        name_length = struct.unpack_from("<H", data, offset + 28)[0]
+        patch(offset + 8, offset + 10, data[offset + 46:offset + 46 + name_length].decode())
+    return bytes(data)
+
+
+def _offsets(data, signature):
+    offset = data.find(signature)
+    while offset != -1:
+        yield offset
+        offset = data.find(signature, offset + 1)
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_unreadable_zip_members_are_reported_per_document(api):
+    archive = _archive(
+        {
+            "good.pdf": _text_pdf("Name: Asha Rao Roll No: R1234"),
+            "locked.pdf": _text_pdf("Name: Locked"),
+            "packed.pdf": _text_pdf("Name: Packed"),
+            "notes.txt": b"not a document",
+        },
+        encrypted={"locked.pdf"},
+        compression={"packed.pdf": 99},
+    )
+
+    response = api.post("/extract-batch", files=[("files", ("documents.zip", archive, "application/zip"))])
+
+    assert response.status_code == 200
+    lines = _lines(response)
+    summary = lines.pop()
+    assert summary == {"status": "complete", "total": 4, "succeeded": 1, "failed": 3}
+
+    by_name = {line["filename"]: line for line in lines}
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    assert by_name["good.pdf"]["status"] == "success"
+    assert "Asha Rao" in by_name["good.pdf"]["extracted_data"]["raw_text"]
+    assert by_name["locked.pdf"]["status"] == "error"
+    assert by_name["locked.pdf"]["detail"].startswith("Could not read locked.pdf from the archive:")
+    assert "encrypted" in by_name["locked.pdf"]["detail"]
+    assert by_name["packed.pdf"]["status"] == "error"
+    assert by_name["packed.pdf"]["detail"].startswith("Could not read packed.pdf from the archive:")
+    assert by_name["notes.txt"]["status"] == "error"
+    assert by_name["notes.txt"]["detail"].startswith("File type .txt not supported")
+
+
+def test_invalid_archive_is_one_error_line(api):
+    response = api.post("/extract-batch", files=[("files", ("documents.zip", b"PK\x03\x04 not really", "application/zip"))])
+
+    lines = _lines(response)
+    assert lines[0]["status"] == "error"
+    assert lines[0]["detail"].startswith("Invalid ZIP archive")
+    assert lines[-1] == {"status": "complete", "total": 1, "succeeded": 0, "failed": 1}
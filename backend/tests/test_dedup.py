@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+
+import fitz
+
+from database import Database
+from models import CredentialExtraction
+
+
+def _text_pdf(text):
+    """A one-page PDF with a text layer, which is extracted without the OCR model"""
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), text)
+    return document.tobytes()
+
+
+PDF = _text_pdf("Name: Asha Rao Roll No: R1234")
+
+
+def _extract(api, filename="certificate.pdf", **params):
+    response = api.post("/extract-text", params=params, files={"file": (filename, PDF, "application/pdf")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stored(tmp_path):
+    return sorted((tmp_path / "uploads").iterdir())
+
+
+def test_same_content_reuses_the_stored_extraction(api, tmp_path):
+    import main
+
+    first = _extract(api)
+    second = _extract(api, filename="copy.pdf")
+
+    assert not first["cached"]
+    assert second["cached"]
+    assert second["file_id"] != first["file_id"]
+    assert second["original_filename"] == "copy.pdf"
+    assert second["extracted_data"] == first["extracted_data"]
+    # The duplicate upload is dropped and the record points at the original file
+    assert len(_stored(tmp_path)) == 1
+    assert api.get(f"/extractions/{second['file_id']}").json()["file_path"] == \
+        api.get(f"/extractions/{first['file_id']}").json()["file_path"]
+    assert main.cache_stats == {"hits": 1, "misses": 1, "bypassed": 0}
+
+
+def test_no_cache_runs_extraction_again(api, tmp_path):
+    import main
+
+    _extract(api)
+    again = _extract(api, no_cache=True)
+
+    assert not again["cached"]
+    assert len(_stored(tmp_path)) == 2
+    assert main.cache_stats == {"hits": 0, "misses": 1, "bypassed": 1}
+
+
+def test_extractions_are_not_reused_across_quality_tiers(api):
+    assert not _extract(api, quality="fast")["cached"]
+    assert not _extract(api, quality="accurate")["cached"]
+
+    assert _extract(api, quality="fast")["cached"]
+    assert _extract(api, quality="accurate")["cached"]
+
+
+def test_queued_upload_of_known_content_is_a_done_job(api):
+    first = _extract(api)
+
+    response = api.post("/jobs", files={"file": ("copy.pdf", PDF, "application/pdf")})
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "done"
+    job = api.get(response.headers["Location"]).json()
+    assert job["status"] == "done"
+    assert job["result"]["extracted_data"] == first["extracted_data"]
+
+
+def test_cache_hit_that_cannot_be_recorded_goes_through_ocr(api, tmp_path, monkeypatch):
+    import main
+
+    first = _extract(api)
+    save = main.database.save_extraction
+    attempts = []
+
+    async def failing_once(extraction):
+        attempts.append(extraction.file_id)
+        if len(attempts) == 1:
+            return False
+        return await save(extraction)
+
+    monkeypatch.setattr(main.database, "save_extraction", failing_once)
+    second = _extract(api, filename="copy.pdf")
+
+    assert not second["cached"]
+    assert second["extracted_data"]["raw_text"] == first["extracted_data"]["raw_text"]
+    # Recorded by the OCR job, from the upload kept for it
+    assert attempts == [second["file_id"], second["file_id"]]
+    assert len(_stored(tmp_path)) == 2
+    assert main.cache_stats["hits"] == 1
+
+
+def test_records_without_a_tier_count_as_the_default_tier(tmp_path):
+    async def scenario():
+        database = Database(str(tmp_path / "credentials.db"))
+        await database.initialize()
+        try:
+            await database.save_extraction(CredentialExtraction(
+                file_id="old", original_filename="old.pdf", file_path="/uploads/old.pdf",
+                extracted_data={"name": "asha rao"}, extraction_timestamp=datetime.now(), content_hash="abc",
+            ))
+            default = await database.get_extraction_by_hash("abc", "balanced", "balanced")
+            other = await database.get_extraction_by_hash("abc", "fast", "balanced")
+        finally:
+            await database.close()
+        assert default["file_id"] == "old"
+        assert other is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from database import EXTRACTION_COLUMNS, Database
+from models import CREDENTIAL_COLUMNS, CREDENTIAL_INDEXES
+
+# The extractions table as the first release created it
+BASELINE_SCHEMA = """
+    CREATE TABLE extractions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_id TEXT UNIQUE NOT NULL,
+        original_filename TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        extracted_data_json TEXT NOT NULL,
+        extraction_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+OLD_RECORDS = {
+    "f1": {"name": "asha rao", "certificate_number": "c-100", "roll_number": "r1", "issue_year": "2019",
+           "institution": "state university", "confidence_score": 0.91},
+    "f2": {"name": "vikram singh", "certificate_number": "c-200", "roll_number": "r2", "issue_year": 2021},
+    "f3": {"raw_text": "nothing recognised"},
+}
+
+
+@pytest.fixture
+def migrated(tmp_path):
+    """A database created with the baseline schema and records, then initialized by the current code"""
+    path = tmp_path / "credentials.db"
+    with sqlite3.connect(path) as db:
+        db.execute(BASELINE_SCHEMA)
+        db.executemany(
+            "INSERT INTO extractions (file_id, original_filename, file_path, extracted_data_json) VALUES (?, ?, ?, ?)",
+            [(file_id, f"{file_id}.pdf", f"/uploads/{file_id}.pdf", json.dumps(data))
+             for file_id, data in OLD_RECORDS.items()],
+        )
+
+    async def initialize():
+        # Twice: the migration must be idempotent
+        for _ in range(2):
+            database = Database(str(path))
+            await database.initialize()
+            await database.close()
+
+    asyncio.run(initialize())
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    yield db
+    db.close()
+
+
+def test_credential_columns_are_added_as_generated_columns(migrated):
+    columns = {row["name"]: row for row in migrated.execute("PRAGMA table_xinfo(extractions)")}
+
+    assert "content_hash" in columns
+    for field, sql_type in CREDENTIAL_COLUMNS.items():
+        assert columns[field]["type"] == sql_type
+        # 2: virtual generated column
+        assert columns[field]["hidden"] == 2
+
+
+def test_old_rows_get_their_credential_values(migrated):
+    rows = {
+        row["file_id"]: row
+        for row in migrated.execute("SELECT file_id, name, certificate_number, roll_number, issue_year, "
+                                    "institution, confidence_score FROM extractions")
+    }
+
+    assert dict(rows["f1"]) == {
+        "file_id": "f1", "name": "asha rao", "certificate_number": "c-100", "roll_number": "r1",
+        "issue_year": 2019, "institution": "state university", "confidence_score": 0.91,
+    }
+    assert rows["f2"]["issue_year"] == 2021
+    assert rows["f2"]["institution"] is None
+    assert rows["f3"]["certificate_number"] is None
+
+
+def test_indexes_are_built_over_old_rows(migrated):
+    indexes = {row["name"] for row in migrated.execute("PRAGMA index_list(extractions)")}
+    assert set(CREDENTIAL_INDEXES) <= indexes
+
+    assert migrated.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    found = migrated.execute(
+        "SELECT file_id FROM extractions INDEXED BY idx_extractions_roll_number WHERE roll_number = 'r2'"
+    ).fetchall()
+    assert [row["file_id"] for row in found] == ["f2"]
+
+
+@pytest.mark.parametrize("field", ["certificate_number", "roll_number"])
+def test_lookups_by_identifier_use_their_index(migrated, field):
+    # The query of Database.find_extractions
+    plan = " ".join(
+        row["detail"] for row in migrated.execute(
+            f"EXPLAIN QUERY PLAN SELECT {EXTRACTION_COLUMNS} FROM extractions WHERE {field} = ? "
+            "ORDER BY extraction_timestamp DESC LIMIT ?",
+            ("x", 10),
+        )
+    )
+
+    assert f"USING INDEX idx_extractions_{field} ({field}=?)" in plan
+    assert "SCAN extractions" not in plan
+
+
+def test_find_extractions_reads_migrated_rows(tmp_path, migrated):
+    async def find():
+        database = Database(str(tmp_path / "credentials.db"))
+        await database.initialize()
+        try:
+            return await database.find_extractions("certificate_number", "c-100", 10)
+        finally:
+            await database.close()
+
+    records = asyncio.run(find())
+
+    assert [record["file_id"] for record in records] == ["f1"]
+    assert records[0]["extracted_data"]["name"] == "asha rao"
@@ -0,0 +1,157 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from database import Database
+from models import DocumentCost, ExtractionJob, JobPriority
+
+PIXELS_PER_SECOND = 1_000_000
+
+
+def _run(tmp_path, scenario):
+    """Run ``scenario(database)`` against a fresh database"""
+    async def main():
+        database = Database(str(tmp_path / "credentials.db"))
+        await database.initialize()
+        try:
+            await scenario(database)
+        finally:
+            await database.close()
+
+    asyncio.run(main())
+
+
+async def _enqueue(database, name, max_attempts=3, pixels=None, priority=JobPriority.INTERACTIVE):
+    now = datetime.now()
+    job = ExtractionJob(
+        job_id=name,
+        file_id=str(uuid.uuid4()),
+        original_filename=f"{name}.png",
+        file_path=f"/uploads/{name}.png",
+        priority=priority,
+        cost=DocumentCost(pixels=pixels) if pixels is not None else None,
+        created_at=now,
+        updated_at=now,
+    )
+    assert await database.enqueue_job(job, max_attempts)
+    return name
+
+
+async def _claim(database, worker_id, lease_seconds=60, bulk_delay=0):
+    return await database.claim_job(worker_id, lease_seconds, bulk_delay, PIXELS_PER_SECOND)
+
+
+def test_claimed_job_is_leased_to_one_worker(tmp_path):
+    async def scenario(database):
+        await _enqueue(database, "job")
+
+        job = await _claim(database, "worker-1")
+        assert job["job_id"] == "job"
+        assert job["status"] == "running"
+        assert job["lease_owner"] == "worker-1"
+        assert job["attempts"] == 1
+        assert await _claim(database, "worker-2") is None
+
+        assert await database.heartbeat_job("job", "worker-1", 60)
+        assert await database.finish_job("job", "worker-1", "done")
+        assert (await database.get_job("job"))["status"] == "done"
+        assert await _claim(database, "worker-2") is None
+
+    _run(tmp_path, scenario)
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    async def scenario(database):
+        await _enqueue(database, "job")
+        # A lease that is already over, as if the worker had crashed
+        await _claim(database, "worker-1", lease_seconds=-1)
+
+        job = await _claim(database, "worker-2")
+        assert job["job_id"] == "job"
+        assert job["lease_owner"] == "worker-2"
+        assert job["attempts"] == 2
+
+        # The first worker lost the lease and can't extend or finish the job
+        assert not await database.heartbeat_job("job", "worker-1", 60)
+        assert not await database.finish_job("job", "worker-1", "done")
+        assert await database.finish_job("job", "worker-2", "done")
+
+    _run(tmp_path, scenario)
+
+
+def test_expired_job_out_of_attempts_is_failed(tmp_path):
+    async def scenario(database):
+        await _enqueue(database, "job", max_attempts=2)
+        await _claim(database, "worker-1", lease_seconds=-1)
+        await _claim(database, "worker-2", lease_seconds=-1)
+
+        assert await _claim(database, "worker-3") is None
+        job = await database.get_job("job")
+        assert job["status"] == "failed"
+        assert job["error"] == "Exceeded maximum attempts"
+        assert job["attempts"] == 2
+        assert job["lease_owner"] is None
+
+    _run(tmp_path, scenario)
+
+
+def test_live_lease_is_not_taken_over(tmp_path):
+    async def scenario(database):
+        await _enqueue(database, "job", max_attempts=1)
+        await _claim(database, "worker-1", lease_seconds=60)
+
+        assert await _claim(database, "worker-2") is None
+        job = await database.get_job("job")
+        assert job["status"] == "running"
+        assert job["lease_owner"] == "worker-1"
+
+    _run(tmp_path, scenario)
+
+
+def test_shorter_job_runs_first(tmp_path):
+    async def scenario(database):
+        # Ten seconds of estimated OCR time against an almost free job enqueued just after
+        await _enqueue(database, "long", pixels=10 * PIXELS_PER_SECOND)
+        await _enqueue(database, "short", pixels=1000)
+
+        assert (await _claim(database, "worker-1"))["job_id"] == "short"
+        assert (await _claim(database, "worker-2"))["job_id"] == "long"
+
+    _run(tmp_path, scenario)
+
+
+def test_bulk_jobs_are_pushed_back_by_the_bulk_delay(tmp_path):
+    async def scenario(database):
+        await _enqueue(database, "bulk", priority=JobPriority.BULK)
+        await _enqueue(database, "interactive")
+
+        assert (await _claim(database, "worker-1", bulk_delay=60))["job_id"] == "interactive"
+        assert (await _claim(database, "worker-2", bulk_delay=60))["job_id"] == "bulk"
+
+    _run(tmp_path, scenario)
+
+
+def test_jobs_run_in_arrival_order_without_costs_or_delay(tmp_path):
+    async def scenario(database):
+        names = [await _enqueue(database, f"job-{n}", priority=JobPriority.BULK if n % 2 else JobPriority.INTERACTIVE)
+                 for n in range(4)]
+
+        claimed = [(await _claim(database, f"worker-{n}"))["job_id"] for n in range(4)]
+        assert claimed == names
+
+    _run(tmp_path, scenario)
+
+
+def test_claim_returns_the_claimed_job_not_one_still_held(tmp_path):
+    async def scenario(database):
+        await _enqueue(database, "stuck")
+        await _enqueue(database, "next")
+        # The worker couldn't finish its first job, which stays leased to it
+        assert (await _claim(database, "worker-1"))["job_id"] == "stuck"
+
+        job = await _claim(database, "worker-1")
+        assert job["job_id"] == "next"
+        assert job["status"] == "running"
+        assert job["attempts"] == 1
+
+    _run(tmp_path, scenario)
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from ocr_pool import OCRWorkerPool
+
+
+@pytest.mark.parametrize("state, error", [("cold", None), ("failed", "warm-up failed")])
+def test_successful_task_makes_the_pool_ready(state, error):
+    async def scenario():
+        pool = OCRWorkerPool(mode="thread", workers=1)
+        pool.state, pool.error = state, error
+        try:
+            assert await pool.run(len, b"abc") == 3
+        finally:
+            pool.shutdown()
+        assert pool.state == "warm"
+        assert pool.error is None
+
+    asyncio.run(scenario())
+
+
+def test_failed_task_leaves_a_failed_warm_up_reported():
+    async def scenario():
+        pool = OCRWorkerPool(mode="thread", workers=1)
+        pool.state, pool.error = "failed", "warm-up failed"
+        try:
+            with pytest.raises(TypeError):
+                await pool.run(len, None)
+        finally:
+            pool.shutdown()
+        assert pool.state == "failed"
+        assert pool.error == "warm-up failed"
+
+    asyncio.run(scenario())
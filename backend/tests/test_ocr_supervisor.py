@@ -0,0 +1,155 @@
+import os
+import time
+
+import pytest
+
+from ocr_supervisor import SupervisedProcessPool, WorkerCrashedError, current_slot
+
+
+# Tasks are pickled by reference, so they live at module level
+
+def _whoami(value):
+    return value, os.getpid(), current_slot()
+
+
+def _die():
+    os._exit(3)
+
+
+def _die_once(marker):
+    """Crash the first worker that runs it, succeed in the next one"""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(3)
+    return os.getpid()
+
+
+def _grow(megabytes):
+    global _ballast
+    _ballast = bytearray(megabytes * 2**20)
+    # Touch every page so it is really allocated
+    _ballast[::4096] = b"x" * len(_ballast[::4096])
+    return os.getpid()
+
+
+def _wait_until(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(*args, **kwargs):
+        pool = SupervisedProcessPool(*args, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def test_runs_tasks_and_returns_their_results_and_errors(make_pool):
+    pool = make_pool(2)
+
+    results = [pool.submit(_whoami, n).result(timeout=30) for n in range(4)]
+
+    assert [value for value, _, _ in results] == [0, 1, 2, 3]
+    assert all(pid != os.getpid() for _, pid, _ in results)
+    assert {slot for _, _, slot in results} <= {0, 1}
+    with pytest.raises(ValueError):
+        pool.submit(int, "not a number").result(timeout=30)
+
+
+def test_crashed_task_is_retried_in_a_fresh_worker(make_pool, tmp_path):
+    pool = make_pool(1, retries=1)
+    first_pid = pool.submit(_whoami, None).result(timeout=30)[1]
+
+    pid = pool.submit(_die_once, str(tmp_path / "crashed")).result(timeout=30)
+
+    assert pid != first_pid
+    assert pool.stats["crashes"] == 1
+    assert pool.stats["retries"] == 1
+    assert pool.stats["failed"] == 0
+
+
+def test_task_crashing_every_attempt_fails_with_worker_crashed_error(make_pool):
+    pool = make_pool(1, retries=1)
+
+    with pytest.raises(WorkerCrashedError):
+        pool.submit(_die).result(timeout=30)
+
+    assert pool.stats["crashes"] == 2
+    assert pool.stats["failed"] == 1
+    # The pool keeps serving other tasks
+    assert pool.submit(_whoami, 1).result(timeout=30)[0] == 1
+
+
+def test_crash_without_retries_fails_at_once(make_pool):
+    pool = make_pool(1, retries=0)
+
+    with pytest.raises(WorkerCrashedError):
+        pool.submit(_die).result(timeout=30)
+
+    assert pool.stats["crashes"] == 1
+    assert pool.stats["retries"] == 0
+
+
+def test_worker_is_recycled_after_max_tasks(make_pool):
+    pool = make_pool(1, max_tasks=2)
+
+    pids = [pool.submit(_whoami, n).result(timeout=30)[1] for n in range(5)]
+
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3]
+    assert len({pids[0], pids[2], pids[4]}) == 3
+    assert pool.stats["recycled_tasks"] == 2
+
+
+def test_worker_is_recycled_once_its_memory_passes_the_limit(make_pool):
+    pool = make_pool(1, max_memory=64 * 2**20)
+
+    grown_pid = pool.submit(_grow, 128).result(timeout=30)
+    next_pid = pool.submit(_whoami, None).result(timeout=30)[1]
+
+    assert next_pid != grown_pid
+    assert pool.stats["recycled_memory"] == 1
+
+
+def test_resize_adds_warmed_workers_and_retires_them(make_pool):
+    pool = make_pool(1, max_workers=3)
+
+    assert pool.resize(3) == 3
+    _wait_until(lambda: pool.load()["warming"] == 0)
+    assert len(pool.status()["processes"]) == 3
+    assert {pool.submit(_whoami, n).result(timeout=30)[0] for n in range(6)} == set(range(6))
+
+    assert pool.resize(1) == 1
+    _wait_until(lambda: len(pool.status()["processes"]) == 1)
+    assert pool.size == 1
+    assert pool.submit(_whoami, 1).result(timeout=30)[0] == 1
+
+
+def test_resize_stays_within_one_and_max_workers(make_pool):
+    pool = make_pool(2, max_workers=3)
+
+    assert pool.resize(10) == 3
+    assert pool.resize(0) == 1
+
+
+def test_growing_again_cancels_a_pending_retirement(make_pool):
+    pool = make_pool(2)
+    # Keep both workers busy so the retirement can't happen yet
+    pool.submit(time.sleep, 0.5)
+    pool.submit(time.sleep, 0.5)
+
+    assert pool.resize(1) == 1
+    assert pool.resize(2) == 2
+
+    _wait_until(lambda: pool.load()["busy"] == 0 and pool.load()["queued"] == 0)
+    assert pool.size == 2
+    assert len(pool.status()["processes"]) == 2
@@ -0,0 +1,132 @@
+import asyncio
+
+from pixel_budget import PixelBudget
+
+
+async def _hold(budget, cost, admitted, label, release):
+    """Reserve ``cost``, note the admission, and hold the budget until released"""
+    async with budget.reserve(cost):
+        admitted.append(label)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_smaller_document_goes_past_a_waiting_large_one():
+    async def scenario():
+        budget = PixelBudget(capacity=100, max_bypass_seconds=60)
+        admitted, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(budget, 60, admitted, "first", release))]
+        await _settle()
+        tasks.append(asyncio.create_task(_hold(budget, 50, admitted, "large", release)))
+        await _settle()
+        tasks.append(asyncio.create_task(_hold(budget, 30, admitted, "small", release)))
+        await _settle()
+
+        assert admitted == ["first", "small"]
+        assert budget.status()["waiting"] == 1
+        assert budget.in_use == 90
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admitted == ["first", "small", "large"]
+        assert budget.in_use == 0 and budget.running == 0
+        assert budget.stats["waited"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_starving_document_holds_back_later_ones():
+    async def scenario():
+        budget = PixelBudget(capacity=100, max_bypass_seconds=0.05)
+        admitted = []
+        first_done, release = asyncio.Event(), asyncio.Event()
+        tasks = [asyncio.create_task(_hold(budget, 60, admitted, "first", first_done))]
+        await _settle()
+        tasks.append(asyncio.create_task(_hold(budget, 50, admitted, "large", release)))
+        await asyncio.sleep(0.1)
+        tasks.append(asyncio.create_task(_hold(budget, 30, admitted, "small", release)))
+        await _settle()
+
+        # The large document has waited past the bypass limit, so the small one queues behind it
+        assert admitted == ["first"]
+        assert budget.status()["waiting"] == 2
+
+        first_done.set()
+        await _settle()
+        assert admitted == ["first", "large", "small"]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert budget.in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_oversized_document_runs_alone():
+    async def scenario():
+        budget = PixelBudget(capacity=100, max_bypass_seconds=60)
+        admitted, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(budget, 500, admitted, "huge", release))]
+        await _settle()
+        tasks.append(asyncio.create_task(_hold(budget, 1, admitted, "tiny", release)))
+        await _settle()
+
+        assert admitted == ["huge"]
+        assert budget.in_use == 100
+        assert budget.stats["oversized"] == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admitted == ["huge", "tiny"]
+        assert budget.in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_wait_leaves_the_budget_untouched():
+    async def scenario():
+        budget = PixelBudget(capacity=100, max_bypass_seconds=60)
+        admitted, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(budget, 100, admitted, "first", release))
+        await _settle()
+        waiter = asyncio.create_task(_hold(budget, 10, admitted, "cancelled", release))
+        await _settle()
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert budget.status()["waiting"] == 0
+
+        release.set()
+        await holder
+        assert admitted == ["first"]
+        assert budget.in_use == 0 and budget.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_starving_document_lets_the_ones_behind_it_in():
+    async def scenario():
+        budget = PixelBudget(capacity=100, max_bypass_seconds=0.05)
+        admitted, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(budget, 60, admitted, "first", release))]
+        await _settle()
+        large = asyncio.create_task(_hold(budget, 50, admitted, "large", release))
+        await asyncio.sleep(0.1)
+        tasks.append(asyncio.create_task(_hold(budget, 30, admitted, "small", release)))
+        await _settle()
+        assert admitted == ["first"]
+
+        large.cancel()
+        await asyncio.gather(large, return_exceptions=True)
+        await _settle()
+        assert admitted == ["first", "small"]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert budget.in_use == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+import config
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def _multipart(filename, content, content_type="application/octet-stream"):
+    """A multipart body with one file field, and its content type"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _stored(tmp_path):
+    return list((tmp_path / "uploads").iterdir())
+
+
+@pytest.mark.parametrize("path", ["/extract-text", "/jobs"])
+def test_content_not_matching_the_extension_is_refused(api, tmp_path, path):
+    response = api.post(path, files={"file": ("scan.png", b"%PDF-1.7\n" + b"0" * 64, "image/png")})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File content does not match its .png extension"
+    assert _stored(tmp_path) == []
+
+
+def test_empty_and_unsupported_uploads_are_refused(api):
+    empty = api.post("/extract-text", files={"file": ("scan.png", b"", "image/png")})
+    assert empty.status_code == 400
+    assert empty.json()["detail"] == "Uploaded file is empty"
+
+    unsupported = api.post("/extract-text", files={"file": ("notes.txt", b"text", "text/plain")})
+    assert unsupported.status_code == 400
+    assert unsupported.json()["detail"].startswith("File type .txt not supported")
+
+
+def test_signatures_are_sniffed_from_the_first_bytes(api):
+    import main
+
+    main._check_signature(PNG, ".png")
+    main._check_signature(b"II*\x00rest", ".tiff")
+    main._check_signature(b"MM\x00*rest", ".tiff")
+    main._check_signature(b"\xff\xd8\xff\xe0rest", ".jpeg")
+    # Readers accept the PDF header anywhere in the first kilobyte
+    main._check_signature(b"\n" * 1000 + b"%PDF-1.7", ".pdf")
+    with pytest.raises(HTTPException):
+        main._check_signature(b"\n" * 1024 + b"%PDF-1.7", ".pdf")
+    with pytest.raises(HTTPException):
+        main._check_signature(b"GIF89a", ".png")
+
+
+@pytest.mark.parametrize("path", ["/extract-text", "/jobs"])
+def test_declared_oversized_upload_is_refused_before_it_is_read(api, tmp_path, monkeypatch, path):
+    import main
+
+    async def unexpected(file):
+        raise AssertionError("the upload was read")
+
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", 1000)
+    monkeypatch.setattr(main, "_save_upload", unexpected)
+    body, content_type = _multipart("scan.png", PNG + b"\x00" * (main.MULTIPART_OVERHEAD + 2000))
+
+    response = api.post(path, content=body, headers={"Content-Type": content_type})
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File too large. Maximum size is 1000 bytes"
+    assert _stored(tmp_path) == []
+
+
+def test_declared_size_within_the_limit_reaches_the_endpoint(api, monkeypatch):
+    import main
+
+    async def refuse(file):
+        raise HTTPException(status_code=418, detail="reached")
+
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", 1000)
+    monkeypatch.setattr(main, "_save_upload", refuse)
+    body, content_type = _multipart("scan.png", PNG)
+
+    assert api.post("/jobs", content=body, headers={"Content-Type": content_type}).status_code == 418
+
+
+def test_undeclared_stream_over_the_limit_is_refused_and_its_partial_file_removed(api, tmp_path, monkeypatch):
+    import main
+
+    opened = []
+    open_file = main.aiofiles.open
+
+    def recording_open(path, *args, **kwargs):
+        opened.append(path)
+        return open_file(path, *args, **kwargs)
+
+    # Written to disk from the first chunk, refused on the second
+    monkeypatch.setattr(config, "UPLOAD_MEMORY_MAX_BYTES", 0)
+    monkeypatch.setattr(config, "UPLOAD_MAX_BYTES", main.UPLOAD_CHUNK_SIZE + main.UPLOAD_CHUNK_SIZE // 2)
+    monkeypatch.setattr(main.aiofiles, "open", recording_open)
+    body, content_type = _multipart("scan.png", PNG + b"\x00" * (3 * main.UPLOAD_CHUNK_SIZE))
+
+    def chunks():
+        # No Content-Length: the body is sent chunked
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+
+    response = api.post("/extract-text", content=chunks(), headers={"Content-Type": content_type})
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == f"File too large. Maximum size is {config.UPLOAD_MAX_BYTES} bytes"
+    assert len(opened) == 1
+    assert _stored(tmp_path) == []
@@ -0,0 +1,211 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from database import Database
+from models import CredentialExtraction
+from ocr_service import OCRService
+from verification import CredentialVerifier, HotSet, match_quality
+
+ASHA = "This is to certify that Asha Rao\nRoll No: R-1234\nCertificate No: CERT/2019-100\nState University"
+VIKRAM = "Name: Vikram Singh\nRoll No: R-1234\nCertificate No: CERT/2021-7"
+
+
+class _Database(Database):
+    """A real database whose lookups can be held in flight once they have read their rows"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.lookups = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def find_extractions(self, field, value, limit):
+        self.lookups += 1
+        records = await super().find_extractions(field, value, limit)
+        await self.release.wait()
+        return records
+
+
+def _run(tmp_path, scenario):
+    """Run ``scenario(database, verifier)`` against a fresh database"""
+    async def main():
+        database = _Database(str(tmp_path / "credentials.db"))
+        await database.initialize()
+        try:
+            await scenario(database, CredentialVerifier(database, max_entries=10, ttl=60, max_matches=5))
+        finally:
+            await database.close()
+
+    asyncio.run(main())
+
+
+async def _store(database, file_id, raw_text):
+    """Store a record with the fields the OCR pipeline would extract from raw_text"""
+    extraction = CredentialExtraction(
+        file_id=file_id,
+        original_filename=f"{file_id}.pdf",
+        file_path=f"/uploads/{file_id}.pdf",
+        extracted_data=OCRService()._parse_credentials(raw_text),
+        extraction_timestamp=datetime.now(),
+    )
+    assert await database.save_extraction(extraction)
+
+
+def test_hot_set_caches_loaded_records_and_evicts_the_oldest():
+    hot_set = HotSet(max_entries=2, ttl=60)
+    for key in (("roll_number", "1"), ("roll_number", "2"), ("roll_number", "3")):
+        assert hot_set.get(key) is None
+        hot_set.loading(key)
+        hot_set.loaded(key, [{"file_id": key[1]}])
+
+    assert hot_set.get(("roll_number", "1")) is None
+    assert hot_set.get(("roll_number", "3")) == [{"file_id": "3"}]
+    assert hot_set.status()["entries"] == 2
+
+
+def test_hot_set_entries_expire():
+    hot_set = HotSet(max_entries=10, ttl=-1)
+    key = ("roll_number", "1")
+    hot_set.loading(key)
+    hot_set.loaded(key, [])
+
+    assert hot_set.get(key) is None
+
+
+def test_hot_set_does_not_cache_failed_or_invalidated_loads():
+    hot_set = HotSet(max_entries=10, ttl=60)
+    key = ("certificate_number", "c1")
+
+    hot_set.loading(key)
+    hot_set.loaded(key, None)
+    assert hot_set.get(key) is None
+
+    hot_set.loading(key)
+    hot_set.discard(key)
+    hot_set.loaded(key, [])
+    assert hot_set.get(key) is None
+
+    # Once no load of the key is in flight, the next one is cached again
+    hot_set.loading(key)
+    hot_set.loaded(key, [])
+    assert hot_set.get(key) == []
+
+
+def test_lookups_find_records_as_the_pipeline_stored_them(tmp_path):
+    async def scenario(database, verifier):
+        await _store(database, "f1", ASHA)
+
+        # Typed the way it is printed on the certificate
+        result = await verifier.verify(certificate_number=" CERT/2019-100 ", name="Asha  Rao")
+
+        assert result["found"]
+        assert [match["file_id"] for match in result["matches"]] == ["f1"]
+        assert result["matches"][0]["match"]["fields"]["certificate_number"] == {"result": "match"}
+        assert (await verifier.verify(roll_number="R-1234"))["found"]
+
+    _run(tmp_path, scenario)
+
+
+def test_records_found_by_either_identifier_are_merged(tmp_path):
+    async def scenario(database, verifier):
+        await _store(database, "f1", ASHA)
+        await _store(database, "f2", VIKRAM)
+
+        result = await verifier.verify(certificate_number="CERT/2019-100", roll_number="R-1234")
+
+        # Both share the roll number; the one matching both identifiers comes first
+        assert [match["file_id"] for match in result["matches"]] == ["f1", "f2"]
+        assert result["matches"][0]["match"]["quality"] == "exact"
+        assert result["matches"][1]["match"]["fields"]["certificate_number"] == {"result": "mismatch"}
+
+    _run(tmp_path, scenario)
+
+
+def test_repeated_lookups_are_served_from_the_hot_set(tmp_path):
+    async def scenario(database, verifier):
+        await _store(database, "f1", ASHA)
+
+        first = await verifier.verify(certificate_number="cert/2019-100")
+        second = await verifier.verify(certificate_number="CERT/2019-100 ")
+
+        assert first == second
+        assert first["found"]
+        assert database.lookups == 1
+        assert verifier.status()["hits"] == 1
+
+    _run(tmp_path, scenario)
+
+
+def test_stored_record_invalidates_a_cached_miss(tmp_path):
+    async def scenario(database, verifier):
+        assert not (await verifier.verify(roll_number="R-1234"))["found"]
+        await _store(database, "f1", ASHA)
+
+        assert (await verifier.verify(roll_number="R-1234"))["found"]
+        assert database.lookups == 2
+
+    _run(tmp_path, scenario)
+
+
+def test_deleted_record_is_no_longer_found(tmp_path):
+    async def scenario(database, verifier):
+        await _store(database, "f1", ASHA)
+        assert (await verifier.verify(certificate_number="CERT/2019-100"))["found"]
+
+        assert await database.delete_extraction("f1")
+
+        assert not (await verifier.verify(certificate_number="CERT/2019-100"))["found"]
+
+    _run(tmp_path, scenario)
+
+
+def test_record_stored_during_an_in_flight_lookup_is_not_hidden_by_it(tmp_path):
+    async def scenario(database, verifier):
+        # The lookup reads "no records", then the record is stored before it returns
+        database.release.clear()
+        lookup = asyncio.create_task(verifier.verify(certificate_number="CERT/2019-100"))
+        while not database.lookups:
+            await asyncio.sleep(0.01)
+        await _store(database, "f1", ASHA)
+        database.release.set()
+        assert not (await lookup)["found"]
+
+        assert verifier.status()["entries"] == 0
+        assert (await verifier.verify(certificate_number="CERT/2019-100"))["found"]
+
+    _run(tmp_path, scenario)
+
+
+def test_verify_needs_an_identifier(tmp_path):
+    async def scenario(database, verifier):
+        with pytest.raises(ValueError):
+            await verifier.verify(name="Asha Rao")
+
+    _run(tmp_path, scenario)
+
+
+def test_match_quality_grades_each_given_field():
+    credential = {"certificate_number": "C-1", "roll_number": "R1", "name": "Asha Rao"}
+
+    exact = match_quality({"certificate_number": "c-1", "name": "rao asha"}, credential)
+    assert exact["quality"] == "exact"
+    assert exact["score"] == 1.0
+
+    strong = match_quality({"certificate_number": "c-1", "name": "asha raj"}, credential)
+    assert strong["quality"] == "strong"
+    assert strong["fields"]["name"]["result"] == "mismatch"
+
+    mismatched = match_quality({"certificate_number": "c-1", "roll_number": "r2", "name": "asha rao"}, credential)
+    assert mismatched["fields"]["roll_number"] == {"result": "mismatch"}
+    assert mismatched["quality"] == "partial"
+
+    other_name = match_quality({"certificate_number": "c-1", "name": "vikram singh"}, credential)
+    assert other_name["fields"]["name"]["result"] == "mismatch"
+    assert other_name["quality"] != "exact"
+
+    missing = match_quality({"certificate_number": "c-1", "name": "asha rao"}, {"certificate_number": "C-1"})
+    assert missing["fields"]["name"] == {"result": "missing"}
+    assert missing["score"] == 1.0
+    assert missing["quality"] == "strong"
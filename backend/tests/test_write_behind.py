@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from write_behind import WriteBehindBatcher
+
+
+class _Store:
+    """Records the batches it is given; a batch containing "bad" fails as a whole"""
+
+    def __init__(self):
+        self.batches = []
+        self.rows = []
+
+    async def flush(self, items):
+        self.batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("constraint failed")
+        self.rows.extend(items)
+
+
+def test_concurrent_writes_share_one_batch():
+    async def scenario():
+        store = _Store()
+        batcher = WriteBehindBatcher(store.flush, max_batch=10, max_delay_ms=50, durability="commit")
+        batcher.start()
+
+        results = await asyncio.gather(*(batcher.submit(n) for n in range(5)))
+        await batcher.stop()
+
+        assert results == [True] * 5
+        assert store.batches == [[0, 1, 2, 3, 4]]
+        assert batcher.stats["batches"] == 1
+        assert batcher.stats["largest_batch"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_failed_batch_is_written_item_by_item():
+    async def scenario():
+        store = _Store()
+        batcher = WriteBehindBatcher(store.flush, max_batch=10, max_delay_ms=50, durability="commit")
+        batcher.start()
+
+        results = await asyncio.gather(*(batcher.submit(item) for item in ("a", "bad", "c")))
+        await batcher.stop()
+
+        # Only the bad row fails its caller
+        assert results == [True, False, True]
+        assert store.batches == [["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+        assert store.rows == ["a", "c"]
+        assert batcher.stats["items"] == 2
+        assert batcher.stats["failed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_is_written_without_waiting_for_the_delay():
+    async def scenario():
+        store = _Store()
+        batcher = WriteBehindBatcher(store.flush, max_batch=3, max_delay_ms=60_000, durability="commit")
+        batcher.start()
+
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(n) for n in range(3))), 5)
+        await batcher.stop()
+
+        assert results == [True] * 3
+        assert store.batches == [[0, 1, 2]]
+
+    asyncio.run(scenario())
+
+
+def test_enqueue_durability_returns_before_the_write_and_stop_drains():
+    async def scenario():
+        store = _Store()
+        batcher = WriteBehindBatcher(store.flush, max_batch=10, max_delay_ms=60_000, durability="enqueue")
+        batcher.start()
+
+        assert await batcher.submit("a")
+        assert store.rows == []
+        assert batcher.status()["pending"] == 1
+
+        await batcher.stop()
+        assert store.rows == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_flush_waits_for_queued_writes():
+    async def scenario():
+        store = _Store()
+        batcher = WriteBehindBatcher(store.flush, max_batch=10, max_delay_ms=60_000, durability="enqueue")
+        batcher.start()
+
+        for item in ("a", "b"):
+            await batcher.submit(item)
+        await asyncio.wait_for(batcher.flush(), 5)
+        assert store.rows == ["a", "b"]
+
+        await batcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_writes_directly_when_not_started():
+    async def scenario():
+        store = _Store()
+        batcher = WriteBehindBatcher(store.flush, max_batch=10, max_delay_ms=50, durability="commit")
+
+        assert await batcher.submit("a")
+        assert not await batcher.submit("bad")
+        assert store.batches == [["a"], ["bad"]]
+
+    asyncio.run(scenario())
+
+
+def test_unknown_durability_is_rejected():
+    with pytest.raises(ValueError):
+        WriteBehindBatcher(lambda items: None, durability="eventually")
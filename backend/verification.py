@@ -0,0 +1,215 @@
+import re
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from database import Database
+
+# Fields a record can be looked up by; each has an index on the extractions table
+IDENTIFIER_FIELDS = ("certificate_number", "roll_number")
+
+# Name similarity from which the name counts as matching
+NAME_MATCH_SIMILARITY = 0.9
+
+# Score from which a match that isn't exact is reported as strong
+STRONG_MATCH_SCORE = 0.75
+
+# Credential fields returned with each match (the full record is at /extractions/{file_id})
+RETURNED_FIELDS = (
+    "name", "roll_number", "certificate_number", "degree", "specialization",
+    "institution", "issue_year", "grade", "confidence_score",
+)
+
+HotSetKey = Tuple[str, str]
+
+
+def normalize_field(value: Optional[str]) -> Optional[str]:
+    """Normalise a looked up value the way OCR'd fields are cleaned before they are stored"""
+    if value is None:
+        return None
+    cleaned = re.sub(r'\s+', ' ', value.strip().lower())
+    cleaned = re.sub(r'[^\w\s\.\-\/\(\)\&]', '', cleaned)
+    return cleaned or None
+
+
+def _name_similarity(query: str, stored: str) -> float:
+    """Similarity of two names between 0 and 1, ignoring word order"""
+    return SequenceMatcher(None, " ".join(sorted(query.split())), " ".join(sorted(stored.split()))).ratio()
+
+
+def match_quality(query: Dict[str, str], credential: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Grade a record against the looked up values: each given field matches, mismatches
+    or is missing from the record. The score is the mean over the fields the record
+    has; the quality is exact when every given field matches, strong or partial below.
+    """
+    fields: Dict[str, Any] = {}
+    scores: List[float] = []
+    for field in IDENTIFIER_FIELDS:
+        if field not in query:
+            continue
+        stored = normalize_field(credential.get(field))
+        if stored is None:
+            fields[field] = {"result": "missing"}
+        else:
+            matched = stored == query[field]
+            fields[field] = {"result": "match" if matched else "mismatch"}
+            scores.append(1.0 if matched else 0.0)
+
+    if "name" in query:
+        stored = normalize_field(credential.get("name"))
+        if stored is None:
+            fields["name"] = {"result": "missing"}
+        else:
+            similarity = _name_similarity(query["name"], stored)
+            fields["name"] = {
+                "result": "match" if similarity >= NAME_MATCH_SIMILARITY else "mismatch",
+                "similarity": round(similarity, 3),
+            }
+            scores.append(similarity)
+
+    score = sum(scores) / len(scores) if scores else 0.0
+    if all(result["result"] == "match" for result in fields.values()):
+        quality = "exact"
+    elif score >= STRONG_MATCH_SCORE:
+        quality = "strong"
+    else:
+        quality = "partial"
+    return {"quality": quality, "score": round(score, 3), "fields": fields}
+
+
+class HotSet:
+    """LRU cache of lookup results by (field, value), including empty ones.
+
+    Entries expire after ``ttl`` seconds, which bounds how stale they can get
+    when other processes write to the database. Writes made by this process
+    invalidate the affected keys right away.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._entries: "OrderedDict[HotSetKey, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        # Keys being read from the database (with the number of readers), and those of
+        # them invalidated meanwhile, whose result mustn't be cached
+        self._loading: Dict[HotSetKey, int] = {}
+        self._stale: Set[HotSetKey] = set()
+
+    def get(self, key: HotSetKey) -> Optional[List[Dict[str, Any]]]:
+        """Cached records of a key, or None when not cached"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def loading(self, key: HotSetKey):
+        """Note that the records of a key are being read, before the read starts"""
+        self._loading[key] = self._loading.get(key, 0) + 1
+
+    def loaded(self, key: HotSetKey, records: Optional[List[Dict[str, Any]]]):
+        """Cache the records read for a key, unless the read failed (None) or the key was invalidated during it"""
+        stale = records is None or key in self._stale
+        self._loading[key] -= 1
+        if not self._loading[key]:
+            del self._loading[key]
+            self._stale.discard(key)
+        if stale:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, records)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: HotSetKey):
+        """Drop a key whose records changed"""
+        self.stats["invalidations"] += 1
+        self._entries.pop(key, None)
+        if key in self._loading:
+            self._stale.add(key)
+
+    def status(self) -> Dict[str, Any]:
+        """Size and counters, for metrics"""
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl, **self.stats}
+
+
+class CredentialVerifier:
+    """Answers "does this certificate or roll number exist, and what did it say?".
+
+    Records are found through the indexed credential columns, one lookup per
+    given identifier, with an in-memory hot set in front of SQLite, and are
+    graded against all the given values (including the name) by
+    ``match_quality``.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        max_entries: int = config.VERIFY_CACHE_ENTRIES,
+        ttl: float = config.VERIFY_CACHE_TTL_SECONDS,
+        max_matches: int = config.VERIFY_MAX_MATCHES,
+    ):
+        self.database = database
+        self.max_matches = max(1, max_matches)
+        self.hot_set = HotSet(max_entries, ttl)
+        database.add_extraction_listener(self.invalidate)
+
+    async def verify(
+        self, certificate_number: Optional[str] = None, roll_number: Optional[str] = None, name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Records with the given certificate or roll number, best matches first"""
+        given = {"certificate_number": certificate_number, "roll_number": roll_number, "name": name}
+        query = {field: normalize_field(value) for field, value in given.items() if normalize_field(value)}
+        if not any(field in query for field in IDENTIFIER_FIELDS):
+            raise ValueError("Provide a certificate_number or a roll_number to verify")
+
+        records: Dict[str, Dict[str, Any]] = {}
+        for field in IDENTIFIER_FIELDS:
+            if field in query:
+                for record in await self._lookup(field, query[field]):
+                    records[record["file_id"]] = record
+
+        matches = [{**record, "match": match_quality(query, record["credential"])} for record in records.values()]
+        matches.sort(key=lambda match: (match["match"]["score"], match["extraction_timestamp"]), reverse=True)
+        return {"query": query, "found": bool(matches), "matches": matches[:self.max_matches]}
+
+    def invalidate(self, credentials: List[Dict[str, Any]]):
+        """Drop the hot set entries of records that were stored or deleted"""
+        for credential in credentials:
+            for field in IDENTIFIER_FIELDS:
+                value = normalize_field(credential.get(field))
+                if value is not None:
+                    self.hot_set.discard((field, value))
+
+    def status(self) -> Dict[str, Any]:
+        """Hot set counters, for metrics"""
+        return self.hot_set.status()
+
+    async def _lookup(self, field: str, value: str) -> List[Dict[str, Any]]:
+        """Records whose field has the value, from the hot set or the database"""
+        key = (field, value)
+        records = self.hot_set.get(key)
+        if records is None:
+            self.hot_set.loading(key)
+            try:
+                rows = await self.database.find_extractions(field, value, self.max_matches)
+                records = [self._summary(row) for row in rows]
+            finally:
+                self.hot_set.loaded(key, records)
+        return records
+
+    @staticmethod
+    def _summary(row: Dict[str, Any]) -> Dict[str, Any]:
+        """What a record said, without the raw text and pipeline details"""
+        data = row["extracted_data"]
+        return {
+            "file_id": row["file_id"],
+            "original_filename": row["original_filename"],
+            "extraction_timestamp": row["extraction_timestamp"],
+            "credential": {field: data[field] for field in RETURNED_FIELDS if data.get(field) is not None},
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Acknowledge a write once it is committed, or as soon as it is queued
+DURABILITY_MODES = ("commit", "enqueue")
+
+
+@dataclass
+class _PendingWrite(Generic[T]):
+    """A queued item and the future its writer may be waiting on"""
+    item: T
+    done: "asyncio.Future[bool]"
+
+
+class WriteBehindBatcher(Generic[T]):
+    """Group commit for inserts coming from concurrent requests.
+
+    Items are queued and written by a single flusher task, which hands up to
+    ``max_batch`` of them at a time to ``flush`` (one transaction, e.g. an
+    ``executemany``). A batch is written once it is full, or ``max_delay_ms``
+    after its first item arrived; items arriving while a batch is being
+    committed go into the next one. If a batch fails its items are written
+    one by one, so a bad item only fails its own caller.
+
+    With ``durability="commit"`` ``submit`` returns once the item is
+    committed; with ``"enqueue"`` it returns as soon as the item is queued,
+    trading the last few milliseconds of writes on a crash for latency.
+    ``stop`` writes everything still queued.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[T]], Awaitable[None]],
+        max_batch: int = config.DB_WRITE_BATCH_SIZE,
+        max_delay_ms: float = config.DB_WRITE_BATCH_DELAY_MS,
+        durability: str = config.DB_WRITE_DURABILITY,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown write durability {durability}. Available modes: {list(DURABILITY_MODES)}")
+        self.flush_items = flush
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self.durability = durability
+        self.stats = {"items": 0, "batches": 0, "largest_batch": 0, "failed": 0}
+        self._pending: List[_PendingWrite[T]] = []
+        self._wakeup = asyncio.Event()  # Items are pending, or stopping
+        self._full = asyncio.Event()  # A full batch is pending, or it should be written now
+        self._idle = asyncio.Event()  # Nothing pending or being written
+        self._idle.set()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flusher task"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write everything still queued, then stop the flusher task"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._full.set()
+            await self._task
+            self._task = None
+
+    async def submit(self, item: T) -> bool:
+        """Queue an item; returns whether it was written (always True once queued in enqueue mode)"""
+        if self._task is None:
+            # Not running: write it straight away
+            return await self._write([item])
+        done: "asyncio.Future[bool]" = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingWrite(item, done))
+        self._idle.clear()
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        if self.durability == "enqueue":
+            return True
+        return await done
+
+    async def flush(self):
+        """Wait until everything queued so far is written"""
+        if self._task is not None:
+            self._full.set()
+            await self._idle.wait()
+
+    def status(self) -> Dict[str, Any]:
+        """Settings and counters, for metrics"""
+        return {
+            "durability": self.durability,
+            "max_batch": self.max_batch,
+            "max_delay_ms": self.max_delay * 1000,
+            "pending": len(self._pending),
+            **self.stats,
+        }
+
+    async def _run(self):
+        """Write batches until stopped and drained"""
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                self._wakeup.clear()
+                self._idle.set()
+                if self._stopping:
+                    return
+                continue
+
+            if len(self._pending) < self.max_batch and self.max_delay > 0:
+                # Give concurrent requests a moment to join the batch
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if len(self._pending) < self.max_batch and not self._stopping:
+                self._full.clear()
+
+            written = await self._write_batch([write.item for write in batch])
+            for write, ok in zip(batch, written):
+                if not write.done.done():
+                    write.done.set_result(ok)
+
+    async def _write_batch(self, items: List[T]) -> List[bool]:
+        """Write a batch in one transaction, falling back to one transaction per item"""
+        if len(items) > 1:
+            try:
+                await self.flush_items(items)
+            except Exception as e:
+                logger.warning(f"Writing a batch of {len(items)} failed, writing them one by one: {e}")
+            else:
+                self._count(len(items))
+                return [True] * len(items)
+        return [await self._write([item]) for item in items]
+
+    async def _write(self, items: List[T]) -> bool:
+        """Write items in one transaction; returns whether it succeeded"""
+        try:
+            await self.flush_items(items)
+        except Exception as e:
+            self.stats["failed"] += len(items)
+            logger.error(f"Write failed: {e}")
+            return False
+        self._count(len(items))
+        return True
+
+    def _count(self, size: int):
+        self.stats["items"] += size
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], size)
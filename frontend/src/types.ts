@@ -9,6 +9,7 @@ export interface ExtractedCredential {
   certificate_number?: string;
   raw_text?: string;
   confidence_score?: number;
+  processing?: Record<string, any>;
 }
 
 export interface OCRResponse {